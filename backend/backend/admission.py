@@ -0,0 +1,237 @@
+"""
+Admission control for the LLM-backed routes
+
+Every LLM-backed request, and every column of /identify/table, runs in a slot.
+A worker has ADMISSION_MAX_IN_FLIGHT slots and gives one user at most
+ADMISSION_MAX_IN_FLIGHT_PER_USER of them, so a user identifying a wide table
+cannot take every connection. Requests that cannot get a slot wait in a bounded
+queue, interactive ones ahead of bulk ones, until their deadline. Once the queue
+of interactive requests is full they are turned away at once with a 429 and a
+Retry-After, rather than holding one of the machine's connections while they
+wait. Bulk requests have a longer queue of their own, so a user opening many
+/identify/table or batch requests cannot queue without limit either.
+"""
+
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from backend import metrics
+
+# below fly.server.toml's soft_limit, so queued requests still have connections
+MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "20"))
+MAX_IN_FLIGHT_PER_USER = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT_PER_USER", "6"))
+MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "16"))
+MAX_QUEUE_PER_USER = int(os.environ.get("ADMISSION_MAX_QUEUE_PER_USER", "8"))
+# room for several /identify/table requests, each with IDENTIFY_TABLE_CONCURRENCY
+# columns waiting
+MAX_BULK_QUEUE = int(os.environ.get("ADMISSION_MAX_BULK_QUEUE", "64"))
+MAX_BULK_QUEUE_PER_USER = int(os.environ.get("ADMISSION_MAX_BULK_QUEUE_PER_USER", "24"))
+# longest wait for a slot, in seconds
+INTERACTIVE_TIMEOUT = float(os.environ.get("ADMISSION_INTERACTIVE_TIMEOUT", "10"))
+BULK_TIMEOUT = float(os.environ.get("ADMISSION_BULK_TIMEOUT", "60"))
+
+# lower runs first
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+in_flight_gauge = metrics.Gauge("admission_in_flight", "Requests holding an LLM slot")
+queue_depth_gauge = metrics.Gauge("admission_queue_depth", "Requests waiting for an LLM slot")
+wait_histogram = metrics.Histogram(
+    "admission_wait_seconds",
+    "Time requests waited for an LLM slot",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+rejected_counter = metrics.Counter(
+    "admission_rejected_total", "Requests turned away without an LLM slot"
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"No LLM slot available ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def to_http(self) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail="The server is busy. Please try again shortly.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    user_id: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class Slot:
+    """A held slot. `release` can be called more than once."""
+
+    def __init__(self, controller: "AdmissionController", user_id: str, priority: int):
+        self._controller = controller
+        self.user_id = user_id
+        self.priority = priority
+        self._start = time.perf_counter()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self, time.perf_counter() - self._start)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_in_flight_per_user: int = MAX_IN_FLIGHT_PER_USER,
+        max_queue: int = MAX_QUEUE,
+        max_queue_per_user: int = MAX_QUEUE_PER_USER,
+        max_bulk_queue: int = MAX_BULK_QUEUE,
+        max_bulk_queue_per_user: int = MAX_BULK_QUEUE_PER_USER,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_user = max_in_flight_per_user
+        # priority -> (waiters, waiters per user)
+        self.max_queue = {
+            INTERACTIVE: (max_queue, max_queue_per_user),
+            BULK: (max_bulk_queue, max_bulk_queue_per_user),
+        }
+        self.in_flight = 0
+        self._user_in_flight: Dict[str, int] = {}
+        # sorted by priority, then arrival
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        # moving average of how long a slot is held, for Retry-After
+        self._hold_time = 1.0
+
+    def _can_run(self, user_id: str) -> bool:
+        return (
+            self.in_flight < self.max_in_flight
+            and self._user_in_flight.get(user_id, 0) < self.max_in_flight_per_user
+        )
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._hold_time * (len(self._queue) + 1) / self.max_in_flight))
+
+    def _take(self, user_id: str, priority: int) -> Slot:
+        self.in_flight += 1
+        self._user_in_flight[user_id] = self._user_in_flight.get(user_id, 0) + 1
+        in_flight_gauge.add(1, priority=PRIORITY_NAMES[priority])
+        return Slot(self, user_id, priority)
+
+    def _release(self, slot: Slot, held: float) -> None:
+        self.in_flight -= 1
+        remaining = self._user_in_flight[slot.user_id] - 1
+        if remaining:
+            self._user_in_flight[slot.user_id] = remaining
+        else:
+            del self._user_in_flight[slot.user_id]
+        in_flight_gauge.add(-1, priority=PRIORITY_NAMES[slot.priority])
+        self._hold_time = 0.9 * self._hold_time + 0.1 * held
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the first waiters, in priority order, whose user
+        is under the per-user limit."""
+        i = 0
+        while i < len(self._queue) and self.in_flight < self.max_in_flight:
+            waiter = self._queue[i]
+            if waiter.future.done():
+                # gave up waiting
+                self._queue.pop(i)
+            elif self._can_run(waiter.user_id):
+                self._queue.pop(i)
+                waiter.future.set_result(self._take(waiter.user_id, waiter.priority))
+            else:
+                i += 1
+
+    def _reject(self, priority: int, reason: str) -> AdmissionRejected:
+        rejected_counter.inc(priority=PRIORITY_NAMES[priority], reason=reason)
+        return AdmissionRejected(reason, self._retry_after())
+
+    async def acquire(
+        self, user_id: str, priority: int = INTERACTIVE, timeout: Optional[float] = None
+    ) -> Slot:
+        """Wait for a slot. Raises AdmissionRejected if the queue is full or
+        the timeout passes first."""
+        start = time.perf_counter()
+        if self._can_run(user_id):
+            wait_histogram.observe(0, priority=PRIORITY_NAMES[priority])
+            return self._take(user_id, priority)
+
+        max_queue, max_queue_per_user = self.max_queue[priority]
+        waiting = [w for w in self._queue if w.priority == priority]
+        if len(waiting) >= max_queue:
+            raise self._reject(priority, "queue_full")
+        if sum(1 for w in waiting if w.user_id == user_id) >= max_queue_per_user:
+            raise self._reject(priority, "user_queue_full")
+
+        waiter = _Waiter(
+            priority, next(self._seq), user_id, asyncio.get_running_loop().create_future()
+        )
+        bisect.insort(self._queue, waiter)
+        queue_depth_gauge.add(1, priority=PRIORITY_NAMES[priority])
+        try:
+            slot = await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except BaseException as error:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+            if waiter.future.done() and not waiter.future.cancelled():
+                # got a slot just as the wait ended
+                waiter.future.result().release()
+            else:
+                waiter.future.cancel()
+            if isinstance(error, asyncio.TimeoutError):
+                raise self._reject(priority, "deadline")
+            raise
+        finally:
+            queue_depth_gauge.add(-1, priority=PRIORITY_NAMES[priority])
+            wait_histogram.observe(time.perf_counter() - start, priority=PRIORITY_NAMES[priority])
+        return slot
+
+    @asynccontextmanager
+    async def slot(
+        self, user_id: str, priority: int = INTERACTIVE, timeout: Optional[float] = None
+    ) -> AsyncIterator[Slot]:
+        slot = await self.acquire(user_id, priority, timeout)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+
+controller = AdmissionController()
+
+
+async def admit(user_id: str) -> Slot:
+    """A slot for an interactive request. Raises a 429 if there is none."""
+    try:
+        return await controller.acquire(user_id, INTERACTIVE, INTERACTIVE_TIMEOUT)
+    except AdmissionRejected as e:
+        print(f"❌ Rejected request from {user_id}: {e}")
+        raise e.to_http()
+
+
+@asynccontextmanager
+async def admitted(user_id: str) -> AsyncIterator[Slot]:
+    """Hold an interactive slot for the block. Raises a 429 if there is none."""
+    slot = await admit(user_id)
+    try:
+        yield slot
+    finally:
+        slot.release()
@@ -1,43 +1,113 @@
+import hashlib
 import os
+import time
+from collections import OrderedDict
 
 import jwt
 from fastapi import HTTPException, Request
 from sqlmodel import SQLModel
 
+from backend.jwks import KeySet
+
 
 class User(SQLModel):
     id: str
     access_token: str
 
 
-# TODO switch to asymmetric signing when this is done:
-# https://github.com/orgs/supabase/discussions/12759
-# rotating the jwt secret is a pain, so keep it safe
+# Legacy HS256 tokens are verified with the shared secret; rotating the jwt
+# secret is a pain, so keep it safe. Asymmetrically signed tokens
+# (https://github.com/orgs/supabase/discussions/12759) are verified with the
+# public keys from SUPABASE_JWKS_URL. During a migration both can be set.
 SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
-if SUPABASE_JWT_SECRET is None:
-    raise Exception("Missing environment variable SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.environ.get("SUPABASE_JWKS_URL")
+if SUPABASE_JWT_SECRET is None and SUPABASE_JWKS_URL is None:
+    raise Exception("Missing environment variable SUPABASE_JWT_SECRET or SUPABASE_JWKS_URL")
+
+key_set = (
+    KeySet(
+        SUPABASE_JWKS_URL,
+        refresh_interval=float(os.environ.get("SUPABASE_JWKS_REFRESH_INTERVAL", "600")),
+    )
+    if SUPABASE_JWKS_URL
+    else None
+)
+
+
+# Verified tokens, keyed by a digest of the token, with their sub and exp
+_verified_tokens: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", "1024"))
+
+
+async def _decode(access_token: str) -> tuple[str, float]:
+    header = jwt.get_unverified_header(access_token)
+    if header.get("alg") == "HS256":
+        if SUPABASE_JWT_SECRET is None:
+            raise Exception("Missing environment variable SUPABASE_JWT_SECRET")
+        res = jwt.decode(
+            access_token, SUPABASE_JWT_SECRET, audience="authenticated", algorithms=["HS256"]
+        )
+    else:
+        if key_set is None:
+            raise Exception("Missing environment variable SUPABASE_JWKS_URL")
+        kid = header.get("kid")
+        signing_key = await key_set.get_or_refresh(kid) if kid else None
+        if signing_key is None:
+            raise Exception(f"Unknown signing key {kid}")
+        res = jwt.decode(
+            access_token,
+            signing_key,
+            audience="authenticated",
+            algorithms=[signing_key.algorithm_name],
+        )
+    return res["sub"], float(res.get("exp", "inf"))
+
+
+async def verify_access_token(access_token: str) -> str:
+    """Validate a JWT and return the user ID (sub).
+
+    Successful verifications are kept in a bounded LRU cache until the token
+    expires, so repeat requests with the same token skip the signature check.
+    """
+    key = hashlib.sha256(access_token.encode()).digest()
+    cached = _verified_tokens.get(key)
+    if cached is not None:
+        sub, exp = cached
+        if exp > time.time():
+            _verified_tokens.move_to_end(key)
+            return sub
+        del _verified_tokens[key]
 
+    # raises jwt.ExpiredSignatureError once the token expires
+    sub, exp = await _decode(access_token)
+    _verified_tokens[key] = (sub, exp)
+    if len(_verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+    return sub
 
-def get_user_id(request: Request) -> str:
+
+async def get_user_id(request: Request) -> str:
     """Authorize by validating a JWT without a round-trip.
 
-    Returns the user ID (sub).
+    Returns the user ID (sub). The result is also stored on the request, so
+    dependencies that call this more than once per request only verify once.
     """
-    if SUPABASE_JWT_SECRET is None:
-        raise Exception("Missing environment variable SUPABASE_JWT_SECRET")
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is not None:
+        return user_id
 
     if not "Authorization" in request.headers:
         raise HTTPException(status_code=401, detail="Missing header Authorization")
     access_token = request.headers["Authorization"].replace("Bearer ", "")
 
     try:
-        res = jwt.decode(
-            access_token, SUPABASE_JWT_SECRET, audience="authenticated", algorithms=["HS256"]
-        )
-        return res["sub"]
+        user_id = await verify_access_token(access_token)
     except jwt.ExpiredSignatureError as e:
         print(e)
         raise HTTPException(status_code=401, detail="Session is expired. Please log in again.")
     except Exception as e:
         print(e)
         raise HTTPException(status_code=401, detail="Could not authenticate")
+
+    request.state.user_id = user_id
+    return user_id
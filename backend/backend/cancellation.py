@@ -0,0 +1,85 @@
+"""
+Stop LLM work that nobody is waiting for
+
+Routes run their work with `run_cancellable`, which cancels it when the client
+disconnects or the request's deadline passes. Cancelling closes the pending LLM
+connection, so the provider stops generating, and unwinds the route's database
+session. The deadline is also handed to the LLM client via `remaining`, so one
+call cannot outlive the request.
+"""
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+from backend import metrics
+
+# seconds from the start of a request to giving up on it
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", "120"))
+
+T = TypeVar("T")
+
+# time.monotonic() deadline of the current request, if any
+deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+cancelled_requests = metrics.Counter(
+    "requests_cancelled_total", "Requests whose work was cancelled, by route and reason"
+)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline."""
+    current = deadline.get()
+    return None if current is None else max(0.0, current - time.monotonic())
+
+
+def set_deadline(timeout: float = REQUEST_TIMEOUT) -> None:
+    """Give the current request a deadline, unless it already has a sooner one."""
+    new = time.monotonic() + timeout
+    current = deadline.get()
+    if current is None or new < current:
+        deadline.set(new)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # the body has been read, so the next message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_cancellable(
+    request: Request, work: Awaitable[T], timeout: float = REQUEST_TIMEOUT
+) -> T:
+    """Await `work`, cancelling it if the client disconnects (raises a 499)
+    or `timeout` seconds pass (raises a 504)."""
+    set_deadline(timeout)
+    route = request.url.path
+    task = asyncio.ensure_future(work)
+    disconnect = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, disconnect}, timeout=remaining(), return_when=asyncio.FIRST_COMPLETED
+        )
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        disconnect.cancel()
+
+    # work that failed because it ran out of time counts as the deadline
+    if task in done and (task.exception() is None or remaining() != 0):
+        return task.result()
+
+    reason = "disconnect" if disconnect in done else "deadline"
+    task.cancel()
+    # let the work unwind, e.g. close its transaction, before the route returns
+    await asyncio.gather(task, return_exceptions=True)
+    cancelled_requests.inc(route=route, reason=reason)
+    print(f"⚡ Cancelled {route} ({reason})")
+    if reason == "disconnect":
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    raise HTTPException(status_code=504, detail="The request took too long. Please try again.")
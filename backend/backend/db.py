@@ -1,32 +1,200 @@
+import asyncio
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from fastapi import Depends
+import json
 import os
+import time
 from typing import Annotated
 
-from sqlalchemy import text
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction
 
 from backend import auth
 
+_engine: AsyncEngine | None = None
+_maker: async_sessionmaker[AsyncSession] | None = None
+_replica_engine: AsyncEngine | None = None
+_replica_maker: async_sessionmaker[AsyncSession] | None = None
+
+
+# Identity is set with transaction-local settings (like `SET LOCAL`) in a
+# single statement. It disappears with the transaction, so a pooled connection
+# can never carry one user's identity into another user's session, and the
+# user id is a bound parameter so the prepared statement is reused.
+LOGIN_STATEMENT = text(
+    "select set_config('role', 'authenticated', true),"
+    " set_config('request.jwt.claims', :claims, true)"
+)
+LOGOUT_STATEMENT = text(
+    "select set_config('role', 'none', true), set_config('request.jwt.claims', '', true)"
+)
+
+
+def _claims(user_id: str) -> str:
+    return json.dumps({"sub": user_id})
+
+
+class UserSession(Session):
+    """Session that logs in as `info["user_id"]` at the start of every
+    transaction."""
+
+
+@event.listens_for(UserSession, "after_begin")
+def _login_on_begin(
+    session: Session, transaction: SessionTransaction, connection: Connection
+) -> None:
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        connection.execute(LOGIN_STATEMENT, {"claims": _claims(user_id)})
+
+
+def _create_engine(connection_string: str) -> AsyncEngine:
+    return create_async_engine(
+        connection_string,
+        pool_size=int(os.environ.get("POSTGRESQL_POOL_SIZE", "5")),
+        max_overflow=int(os.environ.get("POSTGRESQL_POOL_MAX_OVERFLOW", "10")),
+        pool_recycle=int(os.environ.get("POSTGRESQL_POOL_RECYCLE", "1800")),
+        pool_timeout=float(os.environ.get("POSTGRESQL_POOL_TIMEOUT", "30")),
+        pool_pre_ping=os.environ.get("POSTGRESQL_POOL_PRE_PING", "true").lower() == "true",
+    )
+
+
+def get_engine() -> AsyncEngine:
+    """Get the process-wide pooled engine, creating it on first use.
+
+    Pool settings can be tuned with the POSTGRESQL_POOL_* environment variables.
+    """
+    global _engine
+    if _engine is None:
+        connection_string = os.environ.get("POSTGRESQL_CONNECTION_STRING")
+        if connection_string is None:
+            raise Exception("Missing environment variable POSTGRESQL_CONNECTION_STRING")
+        _engine = _create_engine(connection_string)
+    return _engine
+
+
+def get_replica_engine() -> AsyncEngine | None:
+    """Get the pooled engine for the read replica, or None if
+    POSTGRESQL_REPLICA_CONNECTION_STRING is not set."""
+    global _replica_engine
+    if _replica_engine is None:
+        connection_string = os.environ.get("POSTGRESQL_REPLICA_CONNECTION_STRING")
+        if connection_string is None:
+            return None
+        _replica_engine = _create_engine(connection_string)
+    return _replica_engine
+
+
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    global _maker
+    if _maker is None:
+        _maker = async_sessionmaker(
+            get_engine(), expire_on_commit=False, sync_session_class=UserSession
+        )
+    return _maker
+
+
+def _get_replica_session_maker() -> async_sessionmaker[AsyncSession] | None:
+    global _replica_maker
+    if _replica_maker is None:
+        engine = get_replica_engine()
+        if engine is None:
+            return None
+        _replica_maker = async_sessionmaker(
+            engine, expire_on_commit=False, sync_session_class=UserSession
+        )
+    return _replica_maker
+
+
+# 0 when the replica has replayed everything it received; on a primary (e.g. a
+# single-instance stand-in for the replica) the replay functions return null.
+REPLICA_LAG_STATEMENT = text(
+    """
+select case
+    when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0
+    else coalesce(extract(epoch from now() - pg_last_xact_replay_timestamp()), 0)
+end
+"""
+)
+
+
+@dataclass
+class _ReplicaStatus:
+    healthy: bool = False
+    checked_at: float = float("-inf")
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+_replica_status = _ReplicaStatus()
+
+
+async def replica_is_usable() -> bool:
+    """Whether read-only work can go to the replica.
+
+    The replication lag is checked at most once every
+    POSTGRESQL_REPLICA_LAG_CHECK_INTERVAL seconds per process, and the replica
+    is skipped while the lag exceeds POSTGRESQL_REPLICA_MAX_LAG seconds or the
+    check fails.
+    """
+    engine = get_replica_engine()
+    if engine is None:
+        return False
+
+    check_interval = float(os.environ.get("POSTGRESQL_REPLICA_LAG_CHECK_INTERVAL", "5"))
+    if time.monotonic() - _replica_status.checked_at < check_interval:
+        return _replica_status.healthy
+
+    async with _replica_status.lock:
+        # another request may have checked while we waited
+        if time.monotonic() - _replica_status.checked_at < check_interval:
+            return _replica_status.healthy
+        max_lag = float(os.environ.get("POSTGRESQL_REPLICA_MAX_LAG", "10"))
+        try:
+            async with engine.connect() as connection:
+                lag = (await connection.execute(REPLICA_LAG_STATEMENT)).scalar_one()
+            _replica_status.healthy = float(lag) <= max_lag
+            if not _replica_status.healthy:
+                print(f"Replica lag {lag}s exceeds {max_lag}s; reading from the primary")
+        except Exception as e:
+            print("Replica lag check failed; reading from the primary:", e)
+            _replica_status.healthy = False
+        _replica_status.checked_at = time.monotonic()
+    return _replica_status.healthy
+
+
+async def dispose_engine() -> None:
+    """Close all pooled connections. Call on app shutdown."""
+    global _engine, _maker, _replica_engine, _replica_maker
+    if _engine is not None:
+        await _engine.dispose()
+    if _replica_engine is not None:
+        await _replica_engine.dispose()
+    _engine = None
+    _maker = None
+    _replica_engine = None
+    _replica_maker = None
+
 
 @asynccontextmanager
 async def get_session_for_user(user_id: str):
     """Create a sqlalchemy session for the user_id."""
-    print(f"getting session for user {user_id}")
-
-    connection_string = os.environ.get("POSTGRESQL_CONNECTION_STRING")
-    if connection_string is None:
-        raise Exception("Missing environment variable POSTGRESQL_CONNECTION_STRING")
+    async with get_session_maker()(info={"user_id": user_id}) as session:
+        yield session
 
-    engine = create_async_engine(connection_string)
-    maker = async_sessionmaker(engine, expire_on_commit=False)
 
-    async with maker() as session:
-        await session.execute(text(f"call auth.login_as_user('{user_id}')"))
+@asynccontextmanager
+async def get_read_session_for_user(user_id: str):
+    """Create a read-only sqlalchemy session for the user_id, on the replica
+    when it is configured and caught up, otherwise on the primary."""
+    maker = _get_replica_session_maker() if await replica_is_usable() else None
+    async with (maker or get_session_maker())(info={"user_id": user_id}) as session:
         yield session
-    print(f"closed session for user {user_id}")
 
 
 async def session(
@@ -44,13 +212,29 @@ async def session(
             await session.close()
 
 
+async def read_session(
+    user_id: Annotated[str, Depends(auth.get_user_id)],
+):
+    """Create a read-only sqlalchemy session for the authorized user. For use
+    with FastAPI Depends.
+
+    The connection is only checked out while a transaction is open, so wrap
+    each database phase in `async with session.begin():` to release it before
+    slow work like an LLM call.
+    """
+    async with get_read_session_for_user(user_id) as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 @asynccontextmanager
 async def as_admin(session: AsyncSession, user_id: str):
     """Use with context manager to run as admin"""
     # TODO debug log
     # print("logging out -- i.e. becoming admin")
-    await session.execute(text("reset role"))
-    await session.execute(text("call auth.logout()"))
+    await session.execute(LOGOUT_STATEMENT)
     yield
     # print(f"logging back in as user {user_id}")
-    await session.execute(text(f"call auth.login_as_user('{user_id}')"))
+    await session.execute(LOGIN_STATEMENT, {"claims": _claims(user_id)})
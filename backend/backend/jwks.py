@@ -0,0 +1,84 @@
+"""
+Public keys for verifying asymmetrically signed JWTs
+"""
+
+import asyncio
+import json
+import time
+import urllib.request
+
+import jwt
+
+
+class KeySet:
+    """In-memory cache of a JSON Web Key Set, looked up by kid.
+
+    `url` can be an http(s) URL, e.g. the project's
+    `/auth/v1/.well-known/jwks.json`, or a local file path. Keys are refreshed
+    in the background every `refresh_interval` seconds once `start` is called.
+    An unknown kid triggers an early refresh (at most once every
+    `min_refresh_interval` seconds), and concurrent requests share it.
+    """
+
+    def __init__(self, url: str, refresh_interval: float = 600, min_refresh_interval: float = 30):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._refreshed_at = float("-inf")
+        self._refresh_task: asyncio.Task | None = None
+        self._background_task: asyncio.Task | None = None
+
+    def _load(self) -> dict:
+        if self.url.startswith(("http://", "https://")):
+            with urllib.request.urlopen(self.url, timeout=10) as response:
+                return json.load(response)
+        with open(self.url) as f:
+            return json.load(f)
+
+    async def _fetch(self) -> None:
+        data = await asyncio.to_thread(self._load)
+        key_set = jwt.PyJWKSet.from_dict(data)
+        self._keys = {key.key_id: key for key in key_set.keys if key.key_id is not None}
+        self._refreshed_at = time.monotonic()
+
+    async def refresh(self) -> None:
+        """Fetch the key set. Concurrent callers share one fetch."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+        # shield so one cancelled request does not cancel the fetch for the rest
+        await asyncio.shield(self._refresh_task)
+
+    def get(self, kid: str) -> jwt.PyJWK | None:
+        return self._keys.get(kid)
+
+    async def get_or_refresh(self, kid: str) -> jwt.PyJWK | None:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if time.monotonic() - self._refreshed_at >= self.min_refresh_interval:
+            await self.refresh()
+        return self._keys.get(kid)
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print("Failed to refresh JWKS:", e)
+
+    async def start(self) -> None:
+        """Load the keys and start refreshing them in the background."""
+        try:
+            await self.refresh()
+        except Exception as e:
+            # keys will be fetched on demand
+            print("Failed to load JWKS:", e)
+        if self._background_task is None:
+            self._background_task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._background_task is not None:
+            self._background_task.cancel()
+            self._background_task = None
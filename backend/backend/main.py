@@ -1,18 +1,45 @@
-from fastapi import Depends, FastAPI
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pytz import UTC
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend import auth, db
+from backend import admission, auth, cancellation, db, metrics, redis_client
 from backend.routers import suggest_widget
+from backend.suggest import close_llms
 from backend.suggest.custom_type import (
     CustomTypeSuggestion,
     SuggestCustomTypeArgs,
     suggest_custom_type,
 )
-from backend.suggest.identify import Identification, IdentifyColumnArgs, identify_column
+from backend.suggest.identify import (
+    Identification,
+    IdentifyColumnArgs,
+    IdentifyTableArgs,
+    identify_column,
+    identify_table,
+)
+from backend.validate import ValidateColumnArgs, ValidateColumnResult, validate_column
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if auth.key_set is not None:
+        await auth.key_set.start()
+    metrics.start()
+    yield
+    if auth.key_set is not None:
+        await auth.key_set.stop()
+    await metrics.stop()
+    await close_llms()
+    await db.dispose_engine()
+    await redis_client.close_redis()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(suggest_widget.router)
 
 app.add_middleware(
@@ -33,26 +60,89 @@ def get_health() -> None:
     return
 
 
+# -------
+# Metrics
+# -------
+
+# if set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(authorization: str | None = Header(default=None)) -> PlainTextResponse:
+    """Prometheus metrics, totalled over every worker."""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(
+        await metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/suggest/custom-type")
 async def get_suggest_custom_type(
+    request: Request,
     args: SuggestCustomTypeArgs,
-    session: AsyncSession = Depends(db.session),
+    session: AsyncSession = Depends(db.read_session),
     user_id: str = Depends(auth.get_user_id),  # authenticate
 ) -> CustomTypeSuggestion:
-    return await suggest_custom_type(
-        args=args,
-        session=session,
-        user_id=user_id,
-    )
+    async def suggest() -> CustomTypeSuggestion:
+        async with admission.admitted(user_id):
+            return await suggest_custom_type(
+                args=args,
+                session=session,
+                user_id=user_id,
+            )
+
+    # stops the LLM call if the client goes away
+    return await cancellation.run_cancellable(request, suggest())
 
 
 @app.post("/identify/column")
 async def get_identify_column(
+    request: Request,
     args: IdentifyColumnArgs,
-    session: AsyncSession = Depends(db.session),
+    session: AsyncSession = Depends(db.read_session),
     user_id: str = Depends(auth.get_user_id),  # authenticate
 ) -> Identification:
-    return await identify_column(
+    async def identify() -> Identification:
+        async with admission.admitted(user_id):
+            return await identify_column(
+                args=args,
+                session=session,
+                user_id=user_id,
+            )
+
+    # stops the LLM call if the client goes away
+    return await cancellation.run_cancellable(request, identify())
+
+
+@app.post("/identify/table")
+async def get_identify_table(
+    args: IdentifyTableArgs,
+    user_id: str = Depends(auth.get_user_id),  # authenticate
+) -> StreamingResponse:
+    """Identify all columns of a table. Streams one IdentifyTableResult per
+    line (NDJSON) as each column finishes. If the client disconnects, the
+    stream is cancelled and the columns still being identified with it."""
+    if len(args.columns) > 200:
+        raise HTTPException(
+            status_code=400, detail="Too many columns. Please limit to 200 columns."
+        )
+
+    async def stream():
+        async for result in identify_table(args=args, user_id=user_id):
+            yield result.model_dump_json(by_alias=True) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/validate/column")
+async def get_validate_column(
+    args: ValidateColumnArgs,
+    session: AsyncSession = Depends(db.read_session),
+    user_id: str = Depends(auth.get_user_id),  # authenticate
+) -> ValidateColumnResult:
+    return await validate_column(
         args=args,
         session=session,
         user_id=user_id,
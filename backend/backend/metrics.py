@@ -0,0 +1,230 @@
+"""
+Counters and histograms, served in the Prometheus text format
+
+Each worker counts in memory and adds what it counted to a Redis hash every
+METRICS_FLUSH_INTERVAL seconds, so /metrics reports the totals of every uvicorn
+worker and machine that shares the Redis, whichever worker serves the scrape.
+
+Gauges are not added up in Redis: a worker that stops would leave its part in
+the sum forever. Each worker writes its current values to its own hash, which
+expires unless the worker flushes again, and /metrics sums the live ones.
+"""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend import redis_client
+
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+REDIS_KEY = "br-metrics"
+# worker id -> time of its last flush
+WORKERS_KEY = "br-metrics:workers"
+# a worker's gauges are dropped after this many seconds without a flush
+GAUGE_TTL = max(30.0, 3 * FLUSH_INTERVAL)
+WORKER_ID = uuid.uuid4().hex
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+# family name -> (type, help)
+_families: Dict[str, Tuple[str, str]] = {}
+# series ("name{label=...}") -> value, since the last flush
+_pending: Dict[str, float] = {}
+# series -> value, since this worker started; served if Redis is down
+_totals: Dict[str, float] = {}
+# gauge series -> this worker's current value
+_gauges: Dict[str, float] = {}
+_flush_task: Optional[asyncio.Task] = None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return f"{name}{{{inner}}}"
+
+
+def _add(series: str, amount: float) -> None:
+    _pending[series] = _pending.get(series, 0.0) + amount
+    _totals[series] = _totals.get(series, 0.0) + amount
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        _families[name] = ("counter", help)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        _add(_series(self.name, labels), amount)
+
+    def labels(self, **labels: str) -> "CounterSeries":
+        """One series of the counter, e.g. for labels passed as a dict."""
+        return CounterSeries(_series(self.name, labels))
+
+
+class CounterSeries:
+    def __init__(self, series: str):
+        self.series = series
+
+    def inc(self, amount: float = 1) -> None:
+        _add(self.series, amount)
+
+
+class Gauge:
+    """A gauge that is summed across workers, e.g. the number of requests
+    waiting in every worker's queue."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        _families[name] = ("gauge", help)
+
+    def add(self, amount: float, **labels: str) -> None:
+        series = _series(self.name, labels)
+        _gauges[series] = _gauges.get(series, 0.0) + amount
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets) + (math.inf,)
+        _families[name] = ("histogram", help)
+
+    def observe(self, value: float, **labels: str) -> None:
+        for bound in self.buckets:
+            le = "+Inf" if bound == math.inf else f"{bound:g}"
+            # empty buckets too, so every series has all of them
+            _add(_series(f"{self.name}_bucket", {**labels, "le": le}), 1 if value <= bound else 0)
+        _add(_series(f"{self.name}_sum", labels), value)
+        _add(_series(f"{self.name}_count", labels), 1)
+
+
+def _gauges_key(worker_id: str) -> str:
+    return f"br-metrics:gauges:{worker_id}"
+
+
+async def flush() -> None:
+    """Add this worker's counts since the last flush to Redis, and store its
+    gauges."""
+    global _pending
+    if not _pending and not _gauges:
+        return
+    pending, _pending = _pending, {}
+    try:
+        async with redis_client.get_redis().pipeline(transaction=False) as pipe:
+            for series, amount in pending.items():
+                pipe.hincrbyfloat(REDIS_KEY, series, amount)
+            if _gauges:
+                gauges: Dict[str | bytes, float] = {key: value for key, value in _gauges.items()}
+                pipe.hset(_gauges_key(WORKER_ID), mapping=gauges)
+                pipe.expire(_gauges_key(WORKER_ID), math.ceil(GAUGE_TTL))
+                pipe.zadd(WORKERS_KEY, {WORKER_ID: time.time()})
+            await pipe.execute()
+    except Exception:
+        # keep the counts for the next flush
+        for series, amount in pending.items():
+            _pending[series] = _pending.get(series, 0.0) + amount
+        raise
+
+
+async def _flush_forever() -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await flush()
+        except Exception as e:
+            print("Metrics flush failed:", e)
+
+
+def start() -> None:
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_forever())
+
+
+async def stop() -> None:
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+    try:
+        await flush()
+        # this worker's gauges no longer count
+        redis = redis_client.get_redis()
+        await redis.zrem(WORKERS_KEY, WORKER_ID)
+        await redis.delete(_gauges_key(WORKER_ID))
+    except Exception as e:
+        print("Metrics flush failed:", e)
+
+
+def _family(series: str) -> str:
+    name = series.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and _families.get(name[: -len(suffix)], ("",))[0] == "histogram":
+            return name[: -len(suffix)]
+    return name
+
+
+def _sort_key(series: str) -> Tuple[str, float]:
+    """Orders a histogram's buckets by bound. `le` is always the last label."""
+    head, separator, le = series.rpartition('le="')
+    if not separator:
+        return (series, 0.0)
+    return (head, float(le[: -len('"}')]))
+
+
+async def _live_gauges() -> Dict[str, float]:
+    """The gauges summed over the workers that flushed within GAUGE_TTL."""
+    redis = redis_client.get_redis()
+    await redis.zremrangebyscore(WORKERS_KEY, "-inf", time.time() - GAUGE_TTL)
+    workers: List[bytes] = await redis.zrange(WORKERS_KEY, 0, -1)
+    async with redis.pipeline(transaction=False) as pipe:
+        for worker_id in workers:
+            pipe.hgetall(_gauges_key(worker_id.decode()))
+        stored = await pipe.execute()
+    values: Dict[str, float] = {}
+    for worker_values in stored:
+        for series, value in worker_values.items():
+            values[series.decode()] = values.get(series.decode(), 0.0) + float(value)
+    return values
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+async def render() -> str:
+    """Every worker's totals in the Prometheus text format. Falls back to this
+    worker's own totals if Redis is unavailable."""
+    try:
+        await flush()
+        stored = await redis_client.get_redis().hgetall(REDIS_KEY)
+        values = {
+            series.decode(): float(value)
+            for series, value in stored.items()
+            # gauges that older workers added up here
+            if _families.get(_family(series.decode()), ("",))[0] != "gauge"
+        }
+        values.update(await _live_gauges())
+    except Exception as e:
+        print("Metrics unavailable from Redis, serving this worker's:", e)
+        values = {**_totals, **_gauges}
+
+    by_family: Dict[str, list] = {}
+    for series, value in values.items():
+        by_family.setdefault(_family(series), []).append((series, value))
+
+    lines = []
+    for family in sorted(by_family):
+        type_, help = _families.get(family, ("untyped", ""))
+        lines.append(f"# HELP {family} {help}")
+        lines.append(f"# TYPE {family} {type_}")
+        for series, value in sorted(by_family[family], key=lambda item: _sort_key(item[0])):
+            lines.append(f"{series} {_format(value)}")
+    return "\n".join(lines) + "\n"
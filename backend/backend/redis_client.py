@@ -0,0 +1,36 @@
+"""
+Shared async Redis client for the server
+"""
+
+import os
+
+from redis.asyncio import Redis
+
+_client: Redis | None = None
+
+
+def get_redis() -> Redis:
+    """Get the process-wide Redis client, creating it on first use."""
+    global _client
+    if _client is None:
+        connection_string = os.environ.get("REDIS_CONNECTION_STRING")
+        if connection_string is None:
+            raise Exception("Missing environment variable REDIS_CONNECTION_STRING")
+        # same timeouts as the celery broker in tasks.py
+        _client = Redis.from_url(
+            connection_string,
+            socket_connect_timeout=2,
+            socket_timeout=10,
+            socket_keepalive=True,
+            health_check_interval=60,
+        )
+    return _client
+
+
+async def close_redis() -> None:
+    """Close the client's connections. Call on app shutdown."""
+    global _client
+    if _client is not None:
+        # aclose is newer than the types-redis stubs
+        await _client.aclose()  # type: ignore[attr-defined]
+    _client = None
@@ -1,11 +1,27 @@
+import asyncio
+import collections
 import json
-from typing import Any, List, Literal
-
-from fastapi import APIRouter, Depends, HTTPException
+import os
+import re
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, Hashable, Iterator, List, Literal, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import AIMessageChunk
+from starlette.background import BackgroundTask
 from sqlmodel import SQLModel
 
-from backend import auth
-from backend.suggest import create_llm, inference_llm_config
+from backend import admission, auth, cancellation, metrics
+from backend.suggest import (
+    hedge,
+    inference_llm_config,
+    response_json,
+    suggest_widget_llm_route,
+    telemetry,
+)
+from backend.suggest.partial_json import TopLevelFieldParser
 
 router = APIRouter(
     dependencies=[Depends(auth.get_user_id)],
@@ -139,36 +155,423 @@ IT IS VERY IMPORTANT THAT THE RESPONSE IS A ONLY VALID JSON OBJECT.
 )
 
 
-@router.post("/suggest-widget")
-async def suggest_widget(
-    args: SuggestWidgetArgs,
-) -> WidgetSuggestion:
-    """
-    Generate a widget suggestion based on the provided columns and existing widgets.
-    """
-
-    columns = args.columns
-    existing_widgets = args.existingWidgets
-    data_size = args.dataSize
-    engine = args.engine
-
-    if len(columns) > 30:
+def build_prompt(args: SuggestWidgetArgs) -> str:
+    if len(args.columns) > 30:
         raise HTTPException(status_code=400, detail="Too many columns. Please limit to 30 columns.")
 
     prompt = (
-        vega_lite_prompt(data_size) if engine == "vega-lite" else observable_plot_prompt(data_size)
+        vega_lite_prompt(args.dataSize)
+        if args.engine == "vega-lite"
+        else observable_plot_prompt(args.dataSize)
     )
 
     prompt += f"""
 # Columns
 
-{json.dumps(columns, default=lambda x: x.dict(), indent=2)}
+{json.dumps(args.columns, default=lambda x: x.dict(), indent=2)}
 
 # Existing Visualizations
 
-{json.dumps([{"name": w.name, "description": w.description} for w in existing_widgets], indent=2)}
+{json.dumps([{"name": w.name, "description": w.description} for w in args.existingWidgets], indent=2)}
 """
+    return prompt
+
+
+# Vega-Lite spec guard
+
+# the limits the widget prompts ask for
+WIDGET_MAX_MARKS = int(os.environ.get("WIDGET_MAX_MARKS", "400"))
+WIDGET_MAX_LABELS = int(os.environ.get("WIDGET_MAX_LABELS", "40"))
+
+spec_rewrites = metrics.Counter(
+    "suggest_widget_spec_rewrites_total",
+    "Vega-Lite specs changed to fit the data size, by the transform added",
+)
+
+NUMERIC_TYPES = {"integer-numbers", "decimal-numbers", "currency-amounts", "percentages"}
+# channels with an axis or a header, one label per value
+LABEL_CHANNELS = ("x", "y", "row", "column", "facet")
+# channels with a legend, one entry per value
+LEGEND_CHANNELS = ("color", "fill", "stroke", "shape")
+# marks that stack rows with the same position, so a sum draws the same
+STACKED_MARKS = {"bar", "area", "arc"}
+# marks that draw one path per series, whatever the number of rows
+PATH_MARKS = {"line", "area", "trail"}
+POSITION_CHANNELS = {"x", "y", "x2", "y2"}
+DISCRETE_TYPES = {"nominal", "ordinal"}
+# Vega-Lite's default
+DEFAULT_MAX_BINS = 10
+# channels that do not change what is drawn
+_IGNORED_CHANNELS = {"tooltip", "href", "description"}
+
+
+@dataclass
+class ColumnStats:
+    # estimated distinct values in the whole column, None if the sample
+    # cannot tell
+    distinct: Optional[int]
+    numeric: bool
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value.replace(",", ""))
+        return True
+    except ValueError:
+        return False
+
+
+def column_stats(column: SuggestWidgetColumn, data_size: int) -> ColumnStats:
+    """Estimate the column's cardinality from its sample values, with the
+    bias-corrected Chao1 estimator: values seen once in the sample hint at
+    more values that were not sampled. A sample without repeated values, such
+    as the first 10 rows of a short list of countries, says nothing about the
+    cardinality, and Chao1 would make 55 values of 10."""
+    values = [value for value in column.sampleValues if value.strip()]
+    counts = collections.Counter(values)
+    once = sum(1 for count in counts.values() if count == 1)
+    twice = sum(1 for count in counts.values() if count == 2)
+    numeric = column.identification.type in NUMERIC_TYPES or (
+        bool(values) and all(_is_number(value) for value in values)
+    )
+    if once == len(values):
+        return ColumnStats(None, numeric)
+    estimate = len(counts) + once * (once - 1) / (2 * (twice + 1))
+    return ColumnStats(max(1, min(data_size, round(estimate))), numeric)
+
+
+def _unescape(field: str) -> str:
+    return field.replace("\\", "")
+
+
+def _escape(name: str) -> str:
+    # a dot or bracket in a field name would be read as a nested field
+    return re.sub(r"([.\[\]])", r"\\\1", name)
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", name.lower())
+
+
+def _field_definitions(encoding: Any, ignored: Collection[str] = ()) -> Iterator[dict]:
+    """Every field or datum definition of an encoding, including tooltip
+    lists and conditions, except those of the ignored channels."""
+    if not isinstance(encoding, dict):
+        return
+    for channel, definitions in encoding.items():
+        if channel in ignored:
+            continue
+        for definition in definitions if isinstance(definitions, list) else [definitions]:
+            if isinstance(definition, dict):
+                yield definition
+                condition = definition.get("condition")
+                for nested in condition if isinstance(condition, list) else [condition]:
+                    if isinstance(nested, dict):
+                        yield nested
+
+
+def _derived_fields(transforms: Any) -> Set[str]:
+    """Fields created by transforms, which are not columns."""
+    derived: Set[str] = set()
+
+    def collect(value: Any) -> None:
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == "as":
+                    derived.update([item] if isinstance(item, str) else item or [])
+                else:
+                    collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+
+    collect(transforms)
+    if isinstance(transforms, list) and any(
+        isinstance(t, dict) and "fold" in t and "as" not in t for t in transforms
+    ):
+        derived.update(["key", "value"])
+    return derived
+
+
+def _check_fields(spec: Any, columns: Dict[str, str], derived: Set[str]) -> List[str]:
+    """Fix field names that differ from a column only in case or punctuation.
+    Returns the fields that match no column."""
+    if not isinstance(spec, dict):
+        return []
+    derived = derived | _derived_fields(spec.get("transform"))
+    unknown = []
+    for definition in _field_definitions(spec.get("encoding")):
+        field = definition.get("field")
+        if not isinstance(field, str) or _unescape(field) in derived:
+            continue
+        name = columns.get(_normalize(_unescape(field)))
+        if name is None:
+            unknown.append(field)
+        elif field != _escape(name):
+            definition["field"] = _escape(name)
+    for key in ("layer", "concat", "hconcat", "vconcat"):
+        for child in spec.get(key) or []:
+            unknown += _check_fields(child, columns, derived)
+    unknown += _check_fields(spec.get("spec"), columns, derived)
+    return unknown
+
+
+def _mark_type(spec: dict) -> Optional[str]:
+    mark = spec.get("mark")
+    if isinstance(mark, dict):
+        mark = mark.get("type")
+    return mark.lower() if isinstance(mark, str) else None
+
+
+def _views(spec: Any) -> Iterator[dict]:
+    """The spec and every view nested in it by layers, concatenations, facets
+    and repeats."""
+    if not isinstance(spec, dict):
+        return
+    yield spec
+    for key in ("layer", "concat", "hconcat", "vconcat"):
+        for child in spec.get(key) or []:
+            yield from _views(child)
+    yield from _views(spec.get("spec"))
+
+
+def _top_values_transforms(field: str, limit: int, suffix: int) -> List[dict]:
+    """Keep the rows of the field's `limit` most common values."""
+    count, rank = f"__count_{suffix}", f"__rank_{suffix}"
+    return [
+        {"joinaggregate": [{"op": "count", "as": count}], "groupby": [field]},
+        {
+            "window": [{"op": "dense_rank", "as": rank}],
+            "sort": [{"field": count, "order": "descending"}],
+        },
+        {"filter": f"datum.{rank} <= {limit}"},
+    ]
+
+
+class _Unit:
+    """A single-view spec (mark and encoding) and what is known about its
+    fields."""
+
+    def __init__(self, spec: dict, stats: Dict[str, ColumnStats], data_size: int):
+        self.spec = spec
+        self.mark = _mark_type(spec)
+        self.encoding: dict = spec["encoding"]
+        self.stats = stats
+        self.data_size = data_size
+        self.rewrites: List[str] = []
+
+    def definition(self, channel: str) -> Optional[dict]:
+        definition = self.encoding.get(channel)
+        if isinstance(definition, dict) and isinstance(definition.get("field"), str):
+            return definition
+        return None
+
+    def column(self, definition: dict) -> Optional[ColumnStats]:
+        return self.stats.get(_unescape(definition["field"]))
+
+    def is_discrete(self, definition: dict) -> bool:
+        if definition.get("aggregate") or definition.get("bin") or definition.get("timeUnit"):
+            return False
+        type_ = definition.get("type")
+        if type_ is None:
+            column = self.column(definition)
+            return column is not None and not column.numeric
+        return type_ in DISCRETE_TYPES
+
+    def is_continuous(self, definition: dict) -> bool:
+        return (
+            not definition.get("aggregate")
+            and not definition.get("bin")
+            and not self.is_discrete(definition)
+        )
 
+    def cardinality(self, definition: dict) -> int:
+        bin_ = definition.get("bin")
+        if bin_:
+            return (
+                bin_.get("maxbins", DEFAULT_MAX_BINS)
+                if isinstance(bin_, dict)
+                else DEFAULT_MAX_BINS
+            )
+        column = self.column(definition)
+        if column is None or column.distinct is None:
+            return self.data_size
+        return column.distinct
+
+    def add_transforms(self, transforms: List[dict]) -> None:
+        # after the model's own transforms, which may create the fields used
+        self.spec.setdefault("transform", []).extend(transforms)
+
+    def keep_top_values(self, definition: dict, limit: int) -> None:
+        suffix = len(self.spec.get("transform", []))
+        self.add_transforms(_top_values_transforms(definition["field"], limit, suffix))
+        self.rewrites.append("filter")
+
+    def is_aggregated(self) -> bool:
+        return any(
+            definition.get("aggregate")
+            for definition in self.encoding.values()
+            if isinstance(definition, dict)
+        )
+
+    def groups(self) -> List[dict]:
+        """The definitions that split the rows into marks: all fields that are
+        not aggregated, and for paths those that split them into series."""
+        return [
+            definition
+            for channel, definition in self.encoding.items()
+            if channel not in _IGNORED_CHANNELS
+            and not (self.mark in PATH_MARKS and channel in POSITION_CHANNELS)
+            and isinstance(definition, dict)
+            and isinstance(definition.get("field"), str)
+            and not definition.get("aggregate")
+        ]
+
+    def estimate_marks(self) -> int:
+        if self.mark not in PATH_MARKS and not self.is_aggregated():
+            return self.data_size
+        # one mark per group
+        marks = 1
+        for definition in self.groups():
+            marks *= self.cardinality(definition)
+        return min(self.data_size, marks)
+
+    def exceeds_labels(self, definition: dict) -> bool:
+        column = self.column(definition)
+        return (
+            column is not None
+            and column.distinct is not None
+            and column.distinct > WIDGET_MAX_LABELS
+        )
+
+    def guard_labels(self) -> None:
+        for channel in LABEL_CHANNELS:
+            definition = self.definition(channel)
+            if definition is None or not self.is_discrete(definition):
+                continue
+            if not self.exceeds_labels(definition):
+                continue
+            column = self.column(definition)
+            if column is not None and column.numeric:
+                definition["bin"] = True
+                self.rewrites.append("bin")
+            else:
+                self.keep_top_values(definition, WIDGET_MAX_LABELS)
+        for channel in LEGEND_CHANNELS:
+            definition = self.definition(channel)
+            if definition is None or not self.is_discrete(definition):
+                continue
+            if not self.exceeds_labels(definition):
+                continue
+            if definition.get("legend", {}) is not None:
+                # the values are still shown on hover
+                definition["legend"] = None
+                self.encoding.setdefault(
+                    "tooltip",
+                    {"field": definition["field"], "type": definition.get("type", "nominal")},
+                )
+                self.rewrites.append("legend")
+
+    def guard_marks(self) -> None:
+        if self.estimate_marks() <= WIDGET_MAX_MARKS:
+            return
+        x, y = self.definition("x"), self.definition("y")
+        positions = [definition for definition in (x, y) if definition is not None]
+        discrete = [d for d in positions if self.is_discrete(d) or d.get("bin")]
+        continuous = [d for d in positions if self.is_continuous(d)]
+
+        if self.mark in PATH_MARKS or self.is_aggregated():
+            self.cut_groups()
+        elif discrete and continuous:
+            # e.g. one bar per row of a category: one per category instead
+            continuous[0]["aggregate"] = "sum" if self.mark in STACKED_MARKS else "mean"
+            self.rewrites.append("aggregate")
+            if self.estimate_marks() > WIDGET_MAX_MARKS:
+                self.cut_groups()
+        elif self.mark in ("bar", "rect") and len(positions) == 1 and continuous:
+            # one bar per row along a scale: a histogram
+            continuous[0]["bin"] = True
+            other = "y" if positions[0] is x else "x"
+            self.encoding[other] = {"aggregate": "count", "type": "quantitative"}
+            self.rewrites.append("bin")
+        else:
+            # e.g. a scatter plot: a random sample of the rows
+            self.add_transforms([{"sample": WIDGET_MAX_MARKS}])
+            self.rewrites.append("sample")
+
+    def cut_groups(self) -> None:
+        """Too many groups or series: bin or cut down the field with the most
+        values."""
+        groups = [definition for definition in self.groups() if not definition.get("bin")]
+        if not groups:
+            return
+        largest = max(groups, key=self.cardinality)
+        column = self.column(largest)
+        if column is not None and column.numeric:
+            largest["bin"] = True
+            self.rewrites.append("bin")
+        else:
+            others = self.estimate_marks() // max(1, self.cardinality(largest))
+            self.keep_top_values(largest, max(1, WIDGET_MAX_MARKS // max(1, others)))
+
+
+def _guard_units(spec: Any, stats: Dict[str, ColumnStats], data_size: int) -> List[str]:
+    rewrites = []
+    for view in _views(spec):
+        if isinstance(view.get("encoding"), dict) and _mark_type(view) is not None:
+            unit = _Unit(view, stats, data_size)
+            unit.guard_labels()
+            unit.guard_marks()
+            rewrites += unit.rewrites
+    return rewrites
+
+
+def guard_spec(spec: Any, args: SuggestWidgetArgs) -> List[str]:
+    """Check the spec's fields against the columns and rewrite it in place to
+    stay under WIDGET_MAX_MARKS marks and WIDGET_MAX_LABELS labels per axis or
+    legend for dataSize rows, by adding bin, aggregate, sample or filter
+    transforms. Returns the rewrites made. Raises ValueError if a field is not
+    a column.
+
+    Only single views (a mark and its encoding) are rewritten; layers and
+    concatenations are guarded view by view, and encodings shared from a
+    parent are left alone.
+    """
+    columns = {_normalize(column.fieldName): column.fieldName for column in args.columns}
+    unknown = _check_fields(spec, columns, set())
+    if unknown:
+        raise ValueError(
+            f"The vegaLiteSpec uses fields that are not columns: {', '.join(unknown)}. "
+            f"The fieldNames are: {', '.join(column.fieldName for column in args.columns)}."
+        )
+    stats = {column.fieldName: column_stats(column, args.dataSize) for column in args.columns}
+    return _guard_units(spec, stats, args.dataSize)
+
+
+def parse_suggestion(parsed: dict, args: SuggestWidgetArgs) -> WidgetSuggestion:
+    engine = args.engine
+    parsed["engine"] = engine
+
+    if engine == "vega-lite" and "vegaLiteSpec" not in parsed:
+        raise ValueError("The response has no vegaLiteSpec field.")
+
+    if engine == "observable-plot" and "observablePlotCode" not in parsed:
+        raise ValueError("The response has no observablePlotCode field.")
+
+    # Validate the response structure
+    suggestion = WidgetSuggestion(**parsed)
+
+    if engine == "vega-lite":
+        rewrites = guard_spec(suggestion.vegaLiteSpec, args)
+        if rewrites:
+            print(f"⚡ Rewrote the spec for {args.dataSize} rows: {', '.join(rewrites)}")
+            for rewrite in rewrites:
+                spec_rewrites.inc(rewrite=rewrite)
+
+    return suggestion
+
+
+def _print_querying() -> None:
     print(
         f"🤖 Step 1: Querying {inference_llm_config.model_name} for visualization suggestion..."
         + (
@@ -178,42 +581,294 @@ async def suggest_widget(
         )
     )
 
-    try:
-        # Step 1: Get initial suggestion
-        llm = create_llm(inference_llm_config)
-        initial_response = await llm.ainvoke(
-            prompt,
-            response_format=(
-                {"type": "json_object"} if inference_llm_config.mode == "structured" else None
-            ),
-        )
-        initial_suggestion = str(initial_response.content)
 
-        print("✅ Initial LLM response received:", initial_suggestion)
+@router.post("/suggest-widget")
+async def suggest_widget(
+    request: Request,
+    args: SuggestWidgetArgs,
+    user_id: str = Depends(auth.get_user_id),
+) -> WidgetSuggestion:
+    """
+    Generate a widget suggestion based on the provided columns and existing widgets.
+    """
+    prompt = build_prompt(args)
+    _print_querying()
 
-        # Parse the response
-        parsed = json.loads(initial_suggestion)
-        parsed["engine"] = engine
+    async def suggest() -> WidgetSuggestion:
+        async with admission.admitted(user_id):
+            try:
+                # Step 1: Get initial suggestion
+                suggestion = await hedge.invoke(
+                    suggest_widget_llm_route,
+                    prompt,
+                    lambda parsed: parse_suggestion(parsed, args),
+                )
 
-        if engine == "vega-lite" and "vegaLiteSpec" not in parsed:
-            raise HTTPException(
-                status_code=400,
-                detail="Vega-Lite spec not found in the response. Please try again.",
-            )
+                print("✅ Initial LLM response received:", suggestion.name)
+
+                return suggestion
+
+            except Exception as error:
+                print("❌ Error generating visualization suggestion:", error)
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to generate visualization suggestion with {inference_llm_config.model_name}",
+                )
+
+    # stops the LLM call if the client goes away
+    return await cancellation.run_cancellable(request, suggest())
 
-        if engine == "observable-plot" and "observablePlotCode" not in parsed:
-            raise HTTPException(
-                status_code=400,
-                detail="Observable Plot code not found in the response. Please try again.",
+
+def _event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/suggest-widget/stream")
+async def suggest_widget_stream(
+    args: SuggestWidgetArgs,
+    user_id: str = Depends(auth.get_user_id),
+) -> StreamingResponse:
+    """
+    Like /suggest-widget, but streams server-sent events while the model
+    writes:
+
+    - `field`: `{"<key>": value}` as soon as a top-level field (name,
+      description, vegaLiteSpec, ...) is complete
+    - `token`: `{"text": "..."}` for every chunk of the raw completion, so the
+      spec or code can be shown as it is written
+    - `suggestion`: the validated WidgetSuggestion, last. Its spec may differ
+      from the streamed one, see guard_spec
+    - `error`: `{"detail": "..."}` instead of `suggestion` if it fails
+    """
+    prompt = build_prompt(args)
+    # taken before the response starts, so a busy server can still answer 429
+    slot = await admission.admit(user_id)
+    _print_querying()
+
+    async def stream():
+        parser = TopLevelFieldParser()
+        cancellation.set_deadline()
+        try:
+            # not hedged: a second stream could not replace tokens already sent.
+            # If the client disconnects, Starlette cancels this generator and
+            # aclosing closes the LLM connection with it.
+            async with aclosing(
+                telemetry.stream(
+                    suggest_widget_llm_route.endpoint,
+                    inference_llm_config,
+                    prompt,
+                    **hedge.llm_kwargs(inference_llm_config),
+                )
+            ) as chunks:
+                async for chunk in chunks:
+                    text = str(chunk.content)
+                    if not text:
+                        continue
+                    yield _event("token", {"text": text})
+                    for key, value in parser.feed(text):
+                        yield _event("field", {key: value})
+
+            print("✅ Streamed LLM response received:", parser.text)
+            # an invalid response is asked for again, without streaming
+            suggestion = await response_json.parse_with_retry(
+                suggest_widget_llm_route.endpoint,
+                inference_llm_config,
+                prompt,
+                AIMessageChunk(content=parser.text),
+                lambda parsed: parse_suggestion(parsed, args),
+                **hedge.llm_kwargs(inference_llm_config),
+            )
+            yield _event("suggestion", suggestion.model_dump())
+        except Exception as error:
+            print("❌ Error generating visualization suggestion:", error)
+            yield _event(
+                "error",
+                {
+                    "detail": f"Failed to generate visualization suggestion with {inference_llm_config.model_name}"
+                },
             )
+        finally:
+            slot.release()
+
+    # also released after the response, in case the stream never started
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", background=BackgroundTask(slot.release)
+    )
+
 
-        # Validate the response structure
-        suggestion = WidgetSuggestion(**parsed)
-        return suggestion
+class SuggestWidgetBatchArgs(SuggestWidgetArgs):
+    count: int = 3
 
-    except Exception as error:
-        print("❌ Error generating visualization suggestion:", error)
+
+# most suggestions one batch request can ask for
+SUGGEST_WIDGET_BATCH_MAX = int(os.environ.get("SUGGEST_WIDGET_BATCH_MAX", "8"))
+
+duplicate_suggestions = metrics.Counter(
+    "suggest_widget_duplicates_total",
+    "Batch widget suggestions dropped as near-duplicates of another widget",
+)
+
+# the aggregates that draw the same thing
+_AGGREGATE_ALIASES = {"average": "mean"}
+
+
+def _signature_aggregate(definition: dict) -> Optional[str]:
+    if definition.get("bin"):
+        return "bin"
+    if definition.get("timeUnit"):
+        return f"timeUnit:{definition['timeUnit']}"
+    aggregate = definition.get("aggregate")
+    if aggregate is None:
+        return None
+    if not isinstance(aggregate, str):
+        # e.g. {"argmax": "field"}
+        return json.dumps(aggregate, sort_keys=True)
+    return _AGGREGATE_ALIASES.get(aggregate, aggregate)
+
+
+def _vega_lite_signature(spec: Any, marks: set, fields: set) -> None:
+    for view in _views(spec):
+        mark = _mark_type(view)
+        if mark is not None:
+            marks.add(mark)
+        for definition in _field_definitions(view.get("encoding"), _IGNORED_CHANNELS):
+            aggregate = _signature_aggregate(definition)
+            if "field" in definition:
+                fields.add((str(definition["field"]), aggregate))
+            elif aggregate == "count":
+                fields.add(("*", aggregate))
+
+
+def suggestion_signature(suggestion: WidgetSuggestion, field_names: List[str]) -> Hashable:
+    """What a suggestion draws: its marks, and its fields with their
+    aggregates. Which channel shows a field is left out, so a chart with x and
+    y swapped counts as the same chart."""
+    marks: set = set()
+    fields: set = set()
+    if suggestion.engine == "vega-lite":
+        _vega_lite_signature(suggestion.vegaLiteSpec, marks, fields)
+    else:
+        # no spec to read, so the Plot marks called and the columns named
+        code = suggestion.observablePlotCode or ""
+        marks.update(re.findall(r"Plot\.(\w+)\(", code))
+        marks.discard("plot")
+        fields.update(
+            (name, None)
+            for name in field_names
+            if re.search(rf"""["'`.]{re.escape(name)}\b""", code)
+        )
+    if not marks and not fields:
+        # nothing to compare; only an identical name is a duplicate
+        return suggestion.name.strip().lower()
+    return frozenset(marks), frozenset(fields)
+
+
+def _batch_prompt(prompt: str, index: int, suggested: List[str]) -> str:
+    # after the shared prompt, so every call can reuse the provider's prompt cache
+    prompt += f"""
+# Batch
+
+This is suggestion {index + 1} of a batch for the same dashboard. Pick a
+different aspect of the data than the other suggestions would.
+"""
+    if suggested:
+        prompt += f"""
+Already suggested in this batch:
+
+{json.dumps(suggested, indent=2)}
+"""
+    return prompt
+
+
+@router.post("/suggest-widget/batch")
+async def suggest_widget_batch(
+    args: SuggestWidgetBatchArgs,
+    user_id: str = Depends(auth.get_user_id),
+) -> StreamingResponse:
+    """
+    Generate `count` distinct widget suggestions at once, streamed as
+    server-sent events:
+
+    - `suggestion`: a validated WidgetSuggestion, as soon as it is known not to
+      duplicate an existing widget or an earlier suggestion
+    - `error`: `{"detail": "..."}` for a suggestion that failed
+    - `done`: `{"suggestions": n, "duplicates": n}`, last
+
+    The prompt is built once and the LLM calls run concurrently, each in a bulk
+    admission slot. A near-duplicate is dropped and asked for again, up to
+    `count` more calls.
+    """
+    if not 1 <= args.count <= SUGGEST_WIDGET_BATCH_MAX:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate visualization suggestion with {inference_llm_config.model_name}",
+            status_code=400,
+            detail=f"Please ask for between 1 and {SUGGEST_WIDGET_BATCH_MAX} suggestions.",
         )
+    prompt = build_prompt(args)
+    field_names = [column.fieldName for column in args.columns]
+    _print_querying()
+
+    async def suggest_one(index: int, suggested: List[str]) -> WidgetSuggestion:
+        # bulk: single suggestions from other users go first
+        async with admission.controller.slot(user_id, admission.BULK, admission.BULK_TIMEOUT):
+            return await hedge.invoke(
+                suggest_widget_llm_route,
+                _batch_prompt(prompt, index, suggested),
+                lambda parsed: parse_suggestion(parsed, args),
+            )
+
+    async def stream():
+        cancellation.set_deadline()
+        seen = {suggestion_signature(widget, field_names) for widget in args.existingWidgets}
+        suggested: List[str] = []
+        duplicates = 0
+        launched = 0
+        tasks: Set[asyncio.Task] = set()
+
+        def launch() -> None:
+            nonlocal launched
+            tasks.add(asyncio.create_task(suggest_one(launched, list(suggested))))
+            launched += 1
+
+        for _ in range(args.count):
+            launch()
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        suggestion = task.result()
+                    except admission.AdmissionRejected as error:
+                        print("❌ No slot for a batch visualization suggestion:", error)
+                        yield _event(
+                            "error", {"detail": "The server is busy. Please try again shortly."}
+                        )
+                        continue
+                    except Exception as error:
+                        print("❌ Error generating visualization suggestion:", error)
+                        yield _event(
+                            "error",
+                            {
+                                "detail": f"Failed to generate visualization suggestion with {inference_llm_config.model_name}"
+                            },
+                        )
+                        continue
+
+                    signature = suggestion_signature(suggestion, field_names)
+                    if signature in seen:
+                        duplicates += 1
+                        duplicate_suggestions.inc()
+                        print(f"⚡ Dropped near-duplicate suggestion: {suggestion.name}")
+                        if launched < 2 * args.count:
+                            launch()
+                        continue
+                    seen.add(signature)
+                    suggested.append(suggestion.name)
+                    print("✅ Batch LLM response received:", suggestion.name)
+                    yield _event("suggestion", suggestion.model_dump())
+        finally:
+            # e.g. the client disconnected
+            for task in tasks:
+                task.cancel()
+        yield _event("done", {"suggestions": len(suggested), "duplicates": duplicates})
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
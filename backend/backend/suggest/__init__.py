@@ -1,16 +1,30 @@
 import os
 from dataclasses import dataclass
-from typing import Optional, Union
+from typing import Dict, Optional, Tuple, Union
 
+import httpx
 from langchain_anthropic import ChatAnthropic
 from langchain_openai import ChatOpenAI
+from pydantic import SecretStr
+
+# set to "mock" to send every LLM call to scripts/mock_llm.py
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai")
+MOCK_LLM_URL = os.environ.get("MOCK_LLM_URL", "http://127.0.0.1:8001/v1")
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if OPENAI_API_KEY is None:
+if OPENAI_API_KEY is None and LLM_PROVIDER != "mock":
     raise ValueError("OPENAI_API_KEY is not set")
 
 
-@dataclass
+# shared by every OpenAI client in the process
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+# seconds to wait for a free connection when all LLM_MAX_CONNECTIONS are busy
+LLM_POOL_TIMEOUT = float(os.environ.get("LLM_POOL_TIMEOUT", "30"))
+
+
+@dataclass(frozen=True)
 class LLMConfig:
     provider: str
     model_name: str
@@ -19,18 +33,112 @@ class LLMConfig:
 
 
 inference_llm_config = LLMConfig(
-    provider="openai", model_name="o3-mini", reasoning_effort="low", mode="structured"
+    provider=LLM_PROVIDER, model_name="o3-mini", reasoning_effort="low", mode="structured"
+)
+structured_llm_config = LLMConfig(
+    provider=LLM_PROVIDER, model_name="gpt-4o-mini", mode="structured"
 )
-structured_llm_config = LLMConfig(provider="openai", model_name="gpt-4o-mini", mode="structured")
+
+
+# backup model for hedged calls as "<provider>:<model>", e.g.
+# "anthropic:claude-3-5-haiku-latest". Without it the backup request goes to
+# the same model, which still cuts the provider's tail latency.
+LLM_FALLBACK = os.environ.get("LLM_FALLBACK")
+# off by default: a hedged call also sends a second, billed request to the
+# backup model, the same one unless LLM_FALLBACK is set
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "false").lower() == "true"
+
+
+@dataclass(frozen=True)
+class LLMRoute:
+    """The models an endpoint calls, in order of preference, and the latency
+    budget: the longest to wait for one before also asking the next. See
+    backend.suggest.hedge."""
+
+    endpoint: str
+    configs: Tuple[LLMConfig, ...]
+    budget: float
+
+
+def _route(endpoint: str, config: LLMConfig, budget: float) -> LLMRoute:
+    if not LLM_HEDGE:
+        return LLMRoute(endpoint=endpoint, configs=(config,), budget=budget)
+    if LLM_FALLBACK:
+        provider, _, model_name = LLM_FALLBACK.partition(":")
+        fallback = LLMConfig(provider=provider, model_name=model_name, mode=config.mode)
+    else:
+        fallback = config
+    return LLMRoute(endpoint=endpoint, configs=(config, fallback), budget=budget)
+
+
+identify_llm_route = _route(
+    "identify", structured_llm_config, float(os.environ.get("IDENTIFY_LLM_BUDGET", "5"))
+)
+custom_type_llm_route = _route(
+    "custom-type", structured_llm_config, float(os.environ.get("CUSTOM_TYPE_LLM_BUDGET", "8"))
+)
+suggest_widget_llm_route = _route(
+    "suggest-widget",
+    inference_llm_config,
+    float(os.environ.get("SUGGEST_WIDGET_LLM_BUDGET", "30")),
+)
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+_llms: Dict[LLMConfig, Union[ChatOpenAI, ChatAnthropic]] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(600, pool=LLM_POOL_TIMEOUT),
+        )
+    return _http_client
 
 
 def create_llm(config: LLMConfig) -> Union[ChatOpenAI, ChatAnthropic]:
+    """The process-wide client for the config, created on first use.
+
+    OpenAI clients share one pooled HTTP client, so connections and TLS
+    sessions are reused across requests. Anthropic clients keep their own
+    pool, which lives as long as the shared client does. Streamed responses
+    include token usage, for backend.suggest.telemetry.
+    """
+    llm = _llms.get(config)
+    if llm is not None:
+        return llm
     if config.provider == "openai":
-        return ChatOpenAI(
+        llm = ChatOpenAI(
             model_name=config.model_name,
+            http_async_client=get_http_client(),
+            stream_usage=True,
             **({"reasoning_effort": config.reasoning_effort} if config.reasoning_effort else {}),
         )
     elif config.provider == "anthropic":
-        return ChatAnthropic(model=config.model_name)
+        llm = ChatAnthropic(model=config.model_name)
+    elif config.provider == "mock":
+        llm = ChatOpenAI(
+            model_name=config.model_name,
+            openai_api_base=MOCK_LLM_URL,
+            openai_api_key=SecretStr("mock"),
+            http_async_client=get_http_client(),
+            stream_usage=True,
+        )
     else:
         raise ValueError(f"Unsupported LLM provider: {config.provider}")
+    _llms[config] = llm
+    return llm
+
+
+async def close_llms() -> None:
+    global _http_client
+    _llms.clear()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,246 @@
+"""
+Two-tier (in-process + Redis) cache of the custom type catalog used to identify
+columns
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import metrics
+from backend.models import CustomType
+from backend.redis_client import get_redis
+
+REDIS_KEY_PREFIX = "br-catalog-"
+REDIS_TTL = int(os.environ.get("CATALOG_CACHE_TTL", str(24 * 60 * 60)))
+# segments kept in each worker's memory: the public one plus one per recent user
+LOCAL_SIZE = int(os.environ.get("CATALOG_CACHE_LOCAL_SIZE", "1024"))
+
+catalog_loads = metrics.Counter(
+    "catalog_cache_loads_total",
+    "Custom type catalog segments loaded, by where they came from (local, redis, database)",
+)
+
+
+@dataclass(frozen=True)
+class CatalogType:
+    """The fields of a CustomType that identification needs."""
+
+    id: str
+    kind: str
+    name: str
+    description: str
+    rules: Tuple[str, ...]
+    examples: Tuple[str, ...]
+    min_value: Optional[float]
+    max_value: Optional[float]
+    log_scale: bool
+    values_key: Optional[str]
+    updated_at: datetime
+
+
+@dataclass
+class Catalog:
+    types: List[CatalogType]
+    # changes whenever a type visible to the user is added, removed or updated
+    version: str
+
+
+@dataclass
+class CatalogCacheStats:
+    local_hits: int = 0
+    redis_hits: int = 0
+    database_loads: int = 0
+
+
+stats = CatalogCacheStats()
+
+# segment key -> (version, types), least recently used first
+_local: OrderedDict[str, Tuple[str, List[CatalogType]]] = OrderedDict()
+
+_SLIM_COLUMNS = (
+    CustomType.id,
+    CustomType.kind,
+    CustomType.name,
+    CustomType.description,
+    CustomType.rules,
+    CustomType.examples,
+    CustomType.min_value,
+    CustomType.max_value,
+    CustomType.log_scale,
+    CustomType.values_key,
+    CustomType.updated_at,
+)
+
+# Cheap freshness check for both segments in one round trip
+PROBE_STATEMENT = text(
+    """
+select
+    count(*) filter (where public),
+    max(updated_at) filter (where public),
+    count(*) filter (where user_id = :user_id and not public),
+    max(updated_at) filter (where user_id = :user_id and not public)
+from custom_type
+where public or user_id = :user_id
+"""
+)
+
+
+def _to_catalog_type(row) -> CatalogType:
+    return CatalogType(
+        id=str(row.id),
+        kind=row.kind,
+        name=row.name,
+        description=row.description,
+        rules=tuple(row.rules or ()),
+        examples=tuple(row.examples or ()),
+        min_value=float(row.min_value) if row.min_value is not None else None,
+        max_value=float(row.max_value) if row.max_value is not None else None,
+        log_scale=row.log_scale,
+        values_key=row.values_key,
+        updated_at=row.updated_at,
+    )
+
+
+def _dumps(version: str, types: List[CatalogType]) -> str:
+    # vars rather than dataclasses.asdict, which deep-copies every field and
+    # took most of a cache miss
+    return json.dumps(
+        {"version": version, "types": [vars(type_) for type_ in types]},
+        default=lambda x: x.isoformat(),
+    )
+
+
+def _remember(segment: str, version: str, types: List[CatalogType]) -> None:
+    _local[segment] = (version, types)
+    _local.move_to_end(segment)
+    if len(_local) > LOCAL_SIZE:
+        _local.popitem(last=False)
+
+
+def _loads(value: bytes) -> Tuple[str, List[CatalogType]]:
+    data = json.loads(value)
+    types = [
+        CatalogType(
+            **{
+                **type_,
+                "rules": tuple(type_["rules"]),
+                "examples": tuple(type_["examples"]),
+                "updated_at": datetime.fromisoformat(type_["updated_at"]),
+            }
+        )
+        for type_ in data["types"]
+    ]
+    return data["version"], types
+
+
+def _local_types(segment: str, version: str) -> Optional[List[CatalogType]]:
+    cached = _local.get(segment)
+    if cached is None or cached[0] != version:
+        return None
+    stats.local_hits += 1
+    catalog_loads.inc(source="local")
+    _local.move_to_end(segment)
+    return cached[1]
+
+
+async def _redis_types(versions: Dict[str, str]) -> Dict[str, List[CatalogType]]:
+    """The segments whose Redis copy is at the given version, in one round
+    trip."""
+    found: Dict[str, List[CatalogType]] = {}
+    try:
+        values = await get_redis().mget([f"{REDIS_KEY_PREFIX}{segment}" for segment in versions])
+    except Exception as e:
+        print("Catalog cache unavailable:", e)
+        return found
+    for (segment, version), value in zip(versions.items(), values):
+        if value is None:
+            continue
+        redis_version, types = _loads(value)
+        if redis_version == version:
+            stats.redis_hits += 1
+            catalog_loads.inc(source="redis")
+            _remember(segment, version, types)
+            found[segment] = types
+    return found
+
+
+async def _store(versions: Dict[str, str], loaded: Dict[str, List[CatalogType]]) -> None:
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for segment, types in loaded.items():
+                value = _dumps(versions[segment], types)
+                pipe.set(f"{REDIS_KEY_PREFIX}{segment}", value, ex=REDIS_TTL)
+            await pipe.execute()
+    except Exception as e:
+        print("Catalog cache unavailable:", e)
+
+
+async def load_catalog(session: AsyncSession, user_id: str) -> Catalog:
+    """Load the user's custom types plus public ones.
+
+    The public types are one segment shared by every user; each user's own
+    private types are another. Both are versioned by a count and
+    max(updated_at) probe, and only a stale segment is reloaded from the
+    database. The probe is the only invalidation: custom types are written by
+    the frontend straight to the database, so a change shows up on the next
+    load in every worker. The probe and any reload run in short transactions
+    of their own, and the connection is back in the pool during the Redis
+    calls and when this returns.
+    """
+    async with session.begin():
+        public_count, public_updated_at, user_count, user_updated_at = (
+            await session.execute(PROBE_STATEMENT, {"user_id": user_id})
+        ).one()
+    public_version = f"{public_count}:{public_updated_at}"
+    user_version = f"{user_count}:{user_updated_at}"
+
+    # segment -> (version, where clause)
+    segments = {"public": (public_version, CustomType.public == True)}  # noqa: E712
+    if user_count:
+        segments[f"user-{user_id}"] = (
+            user_version,
+            (CustomType.user_id == user_id) & (CustomType.public == False),  # noqa: E712
+        )
+
+    types: Dict[str, List[CatalogType]] = {}
+    for segment, (version, _) in segments.items():
+        cached = _local_types(segment, version)
+        if cached is not None:
+            types[segment] = cached
+    missing = {
+        segment: version for segment, (version, _) in segments.items() if segment not in types
+    }
+    if missing:
+        types.update(await _redis_types(missing))
+    missing = {segment: version for segment, version in missing.items() if segment not in types}
+    if missing:
+        loaded: Dict[str, List[CatalogType]] = {}
+        async with session.begin():
+            for segment, version in missing.items():
+                stats.database_loads += 1
+                catalog_loads.inc(source="database")
+                rows = (
+                    await session.execute(select(*_SLIM_COLUMNS).where(segments[segment][1]))
+                ).all()
+                loaded[segment] = [_to_catalog_type(row) for row in rows]
+                _remember(segment, version, loaded[segment])
+        await _store(missing, loaded)
+        types.update(loaded)
+    user_types = types.get(f"user-{user_id}", [])
+    public_types = types["public"]
+
+    # users without private types share a version, and so share identify cache
+    # entries
+    version_source = f"{public_version}|{user_id}:{user_version}" if user_count else public_version
+    return Catalog(
+        types=user_types + public_types,
+        version=hashlib.sha256(version_source.encode()).hexdigest()[:16],
+    )
@@ -0,0 +1,221 @@
+"""
+Identify obvious built-in column types locally, without the LLM
+"""
+
+import ipaddress
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+from backend import metrics
+from backend.suggest.catalog import CatalogType
+
+CONFIDENCE_THRESHOLD = float(os.environ.get("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.95"))
+MIN_VALUES = 3
+
+MISSING_VALUES = frozenset(["", "-", "na", "n/a", "nan", "null", "none"])
+
+# Column names of numbers that are really codes (postal-codes, phone-numbers,
+# identifiers); the LLM sees the name, so these are left to it.
+CODE_COLUMN_NAME = re.compile(
+    r"(^|_)(id|ids|key|code|codes|zip|zipcode|postal|postcode|plz|"
+    r"phone|tel|telephone|mobile|cell|fax|ssn|isbn|ean|upc|sku)(_|$)"
+)
+# a zero before another digit is kept only by codes, not by numbers
+LEADING_ZERO = re.compile(r"[+-]?0\d")
+# longer runs of digits are phone numbers, account numbers and the like
+MAX_NUMBER_DIGITS = 9
+
+local_classifications = metrics.Counter(
+    "identify_local_classifications_total",
+    "Columns identify_column classified without the LLM (short_circuit) or not (fallback)",
+)
+
+
+def _is_ip_address(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+@dataclass
+class _Check:
+    type: str
+    description: str
+    match: Callable[[str], object]
+    # custom type kind that could also describe the column
+    custom_kind: Optional[str] = None
+
+
+# Ordered from most to least specific; the first check that clears the
+# threshold wins (e.g. integers also parse as decimals).
+_CHECKS = [
+    _Check(
+        "boolean",
+        "True/false values",
+        re.compile(r"true|false|yes|no", re.IGNORECASE).fullmatch,
+    ),
+    _Check(
+        "integer-numbers",
+        "Whole numbers",
+        re.compile(r"[+-]?(\d+|\d{1,3}(,\d{3})+)").fullmatch,
+        "integer",
+    ),
+    _Check(
+        "decimal-numbers",
+        "Numbers with decimal points",
+        re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?").fullmatch,
+        "decimal",
+    ),
+    _Check(
+        "percentages",
+        "Percentage values",
+        re.compile(r"[+-]?(\d+\.?\d*|\.\d+)\s?%").fullmatch,
+    ),
+    _Check(
+        "currency-amounts",
+        "Monetary values with currency symbols",
+        re.compile(r"[+-]?[$€£¥]\s?\d{1,3}(,?\d{3})*(\.\d+)?").fullmatch,
+    ),
+    _Check(
+        "dates",
+        "Date values",
+        re.compile(
+            r"\d{4}-\d{2}-\d{2}|\d{4}/\d{2}/\d{2}|\d{1,2}/\d{1,2}/\d{2,4}|\d{1,2}\.\d{1,2}\.\d{4}"
+        ).fullmatch,
+        "date",
+    ),
+    _Check(
+        "times",
+        "Time values without dates",
+        re.compile(r"([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d+)?)?(\s?[AaPp][Mm])?").fullmatch,
+        "time",
+    ),
+    _Check(
+        "email-addresses",
+        "Valid email addresses",
+        re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+").fullmatch,
+    ),
+    _Check(
+        "urls",
+        "Valid URLs",
+        re.compile(r"(https?|ftp)://[^\s/$.?#][^\s]*", re.IGNORECASE).fullmatch,
+    ),
+    _Check("ip-addresses", "IPv4 or IPv6 addresses", _is_ip_address),
+    _Check(
+        "color-codes",
+        "Hex color codes",
+        re.compile(r"#([0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})").fullmatch,
+    ),
+    _Check(
+        "identifiers",
+        "Identifiers such as UUIDs, hashes or prefixed codes",
+        re.compile(
+            # UUIDs
+            r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}"
+            # hex hashes and object ids
+            r"|[0-9a-fA-F]{16,64}"
+            # ULIDs
+            r"|[0-9A-HJKMNP-TV-Z]{26}"
+            # prefixed codes, e.g. INV-00123, user_42, ENSG00000139618
+            r"|[A-Za-z]{1,10}[-_:]?\d{2,}"
+        ).fullmatch,
+    ),
+]
+
+
+@dataclass
+class ClassifierStats:
+    short_circuits: int = 0
+    fallbacks: int = 0
+
+    @property
+    def short_circuit_rate(self) -> float:
+        total = self.short_circuits + self.fallbacks
+        return self.short_circuits / total if total else 0.0
+
+
+stats = ClassifierStats()
+
+
+@dataclass
+class Classification:
+    type: str
+    description: str
+    confidence: float
+
+
+def score(check: _Check, values: List[str]) -> float:
+    """Fraction of values that pass the check."""
+    return sum(1 for v in map(check.match, values) if v) / len(values)
+
+
+def classify_values(values: Iterable[str]) -> Optional[Classification]:
+    """Return a built-in type if the values clear the confidence threshold,
+    otherwise None."""
+    present = [v.strip() for v in values if v.strip().lower() not in MISSING_VALUES]
+    if len(present) < MIN_VALUES:
+        return None
+    for check in _CHECKS:
+        confidence = score(check, present)
+        if confidence >= CONFIDENCE_THRESHOLD:
+            return Classification(
+                type=check.type,
+                description=(
+                    f"{check.description} ({confidence:.0%} of {len(present)} sample values "
+                    "matched a local check)"
+                ),
+                confidence=confidence,
+            )
+    return None
+
+
+def _normalize_column_name(column_name: str) -> str:
+    # camelCase and punctuation to snake_case, e.g. "zipCode" -> "zip_code"
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", column_name)
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def looks_like_codes(column_name: str, sample_values: List[str]) -> bool:
+    """Whether integer-looking values are probably codes (zip codes, phone
+    numbers, ids) rather than numbers: by the column name, leading zeros or
+    long runs of digits."""
+    if CODE_COLUMN_NAME.search(_normalize_column_name(column_name)):
+        return True
+    present = [v.strip() for v in sample_values if v.strip().lower() not in MISSING_VALUES]
+    return any(
+        LEADING_ZERO.match(v) or sum(c.isdigit() for c in v) > MAX_NUMBER_DIGITS for v in present
+    )
+
+
+def classify_column(
+    column_name: str, sample_values: List[str], custom_types: List[CatalogType]
+) -> Optional[Classification]:
+    """Fast path for identify_column.
+
+    Returns None, so the caller falls back to the LLM, when no built-in type is
+    confident, when numbers look like codes the LLM could tell apart from the
+    column name (see looks_like_codes), or when one of the custom types has the
+    same kind (e.g. an integer custom type could be the better match for an
+    integer column).
+    """
+    classification = classify_values(sample_values)
+    if classification is not None:
+        check = next(c for c in _CHECKS if c.type == classification.type)
+        if check.type == "integer-numbers" and looks_like_codes(column_name, sample_values):
+            classification = None
+        elif check.custom_kind is not None and any(
+            type_.kind == check.custom_kind for type_ in custom_types
+        ):
+            classification = None
+
+    if classification is None:
+        stats.fallbacks += 1
+        local_classifications.inc(outcome="fallback")
+    else:
+        stats.short_circuits += 1
+        local_classifications.inc(outcome="short_circuit")
+    return classification
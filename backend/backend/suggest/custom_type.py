@@ -1,12 +1,15 @@
-import json
-from typing import List
+import asyncio
+from dataclasses import asdict
+from typing import Annotated, List
 
+from annotated_types import MaxLen
 from fastapi import HTTPException
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Field, SQLModel
 
-from backend.suggest import create_llm, structured_llm_config
+from backend.suggest import custom_type_llm_route, hedge, single_flight, structured_llm_config
+from backend.suggest.numeric_profile import MAX_VALUES, NumericProfile, profile_values
 
 
 class CustomTypeSuggestion(SQLModel):
@@ -30,6 +33,17 @@ class SuggestCustomTypeArgs(SQLModel):
     columnName: str
     sampleValues: List[str]
     numericOptions: NumericOptions | None = None
+    # a large sample of the column for numeric statistics; clients send at
+    # most MAX_VALUES
+    columnValues: Annotated[List[str], MaxLen(MAX_VALUES)] | None = None
+
+
+def describe_profile(profile: NumericProfile) -> str:
+    quantiles = ", ".join(f"p{q * 100:g} {x:g}" for q, x in profile.quantiles.items())
+    return (
+        f"Statistics of {profile.count} values: min {profile.min:g}, max {profile.max:g}, "
+        f"{quantiles}, spanning {profile.decades:.1f} orders of magnitude"
+    )
 
 
 async def suggest_custom_type(
@@ -54,11 +68,24 @@ provided as strings!
 5. A list of invalid example values that don't match these rules. notExamples must be
 provided as strings!"""
 
-    if args.numericOptions:
-        prompt += f"\n\nThis is a {args.numericOptions.kind} type."
-        if args.numericOptions.needsMinMax:
+    # ranges and scales come from the data when it is numeric; the LLM only
+    # guesses them from the samples otherwise
+    profile = None
+    numeric_options = args.numericOptions
+    if numeric_options and (numeric_options.needsMinMax or numeric_options.needsLogScale):
+        profile = await asyncio.to_thread(
+            profile_values, args.columnValues or args.sampleValues, numeric_options.kind
+        )
+    needs_min_max = numeric_options is not None and numeric_options.needsMinMax and not profile
+    needs_log_scale = numeric_options is not None and numeric_options.needsLogScale and not profile
+
+    if numeric_options:
+        prompt += f"\n\nThis is a {numeric_options.kind} type."
+        if profile:
+            prompt += f"\n{describe_profile(profile)}"
+        if needs_min_max:
             prompt += "\nPlease also suggest appropriate minimum and maximum values for this data."
-        if args.numericOptions.needsLogScale:
+        if needs_log_scale:
             prompt += "\nPlease also suggest whether a logarithmic scale would be appropriate for this data (true/false)."
 
     prompt += """\n\nFormat your response as a JSON object with the following structure:
@@ -69,33 +96,53 @@ provided as strings!"""
   "examples": ["example1", "example2", ...],
   "notExamples": ["1", "2.5", ...]"""
 
-    if args.numericOptions:
-        if args.numericOptions.needsMinMax:
-            prompt += """,
+    if needs_min_max:
+        prompt += """,
   "minValue": number,
   "maxValue": number"""
-        if args.numericOptions.needsLogScale:
-            prompt += """,
+    if needs_log_scale:
+        prompt += """,
   "logScale": boolean"""
 
     prompt += "\n}\n\nReminder: all examples and notExamples must be provided as strings!"
 
-    try:
-        llm = create_llm(structured_llm_config)
-        response = await llm.ainvoke(prompt, response_format={"type": "json_object"})
-        suggestion_data = json.loads(str(response.content))
+    async def suggest_with_llm() -> str:
+        suggestion = await hedge.invoke(
+            custom_type_llm_route,
+            prompt,
+            lambda data: CustomTypeSuggestion(**data),
+        )
+        if profile and numeric_options:
+            if numeric_options.needsMinMax:
+                suggestion.minValue = profile.suggested_min
+                suggestion.maxValue = profile.suggested_max
+            if numeric_options.needsLogScale:
+                suggestion.logScale = profile.log_scale
+        return suggestion.model_dump_json()
 
-        # Get a unique name for the suggestion
-        suggestion = CustomTypeSuggestion(**suggestion_data)
+    try:
+        # identical requests at the same time share one LLM call; the unique
+        # name below is still looked up for each request. The prompt and the
+        # profile are all columnValues contributes, so it is not hashed itself.
+        flight_key = single_flight.key(
+            "custom-type",
+            user_id=user_id,
+            prompt=prompt,
+            profile=asdict(profile) if profile else None,
+        )
+        suggestion = CustomTypeSuggestion.model_validate_json(
+            await single_flight.run(flight_key, "custom-type", suggest_with_llm)
+        )
 
-        # Get a unique name for the suggestion
+        # Get a unique name for the suggestion. The session has no connection
+        # checked out until now, so the LLM call above did not hold one.
         try:
-            res = await session.execute(
-                text(
-                    f"select public.get_unique_custom_type_name('{suggestion.name}', '{user_id}')"
-                ),
-            )
-            unique_name = res.scalar_one()
+            async with session.begin():
+                res = await session.execute(
+                    text("select public.get_unique_custom_type_name(:name, :user_id)"),
+                    {"name": suggestion.name, "user_id": user_id},
+                )
+                unique_name = res.scalar_one()
             if unique_name is None:
                 raise HTTPException(
                     status_code=400,
@@ -0,0 +1,43 @@
+"""
+Identify enum custom types by checking sample values against their Redis sets
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+from backend.redis_client import get_redis
+from backend.suggest.catalog import CatalogType
+from backend.suggest.classify import MISSING_VALUES
+
+MATCH_THRESHOLD = float(os.environ.get("ENUM_MATCH_THRESHOLD", "0.9"))
+MIN_VALUES = 3
+
+
+async def match_enum_type(
+    sample_values: List[str], custom_types: List[CatalogType]
+) -> Optional[Tuple[CatalogType, float]]:
+    """Find the enum custom type whose value set contains the largest share of
+    the sample values, if that share clears MATCH_THRESHOLD.
+
+    One SMISMEMBER per enum type, all sent in a single pipeline, so this is one
+    round trip regardless of how many enum types there are or how large their
+    sets are.
+    """
+    enum_types = [type_ for type_ in custom_types if type_.kind == "enum" and type_.values_key]
+    values = list(
+        dict.fromkeys(v for v in sample_values if v.strip().lower() not in MISSING_VALUES)
+    )
+    if not enum_types or len(values) < MIN_VALUES:
+        return None
+
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for type_ in enum_types:
+            pipe.smismember(type_.values_key, values)
+        results = await pipe.execute()
+
+    best: Optional[Tuple[CatalogType, float]] = None
+    for type_, membership in zip(enum_types, results):
+        ratio = sum(membership) / len(values)
+        if ratio >= MATCH_THRESHOLD and (best is None or ratio > best[1]):
+            best = (type_, ratio)
+    return best
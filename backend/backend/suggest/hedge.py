@@ -0,0 +1,173 @@
+"""
+Hedged LLM calls
+
+Sends the prompt to the first model of an LLMRoute. If there is no valid
+response after the hedge delay, or that call fails, the prompt also goes to the
+next model. The first valid response wins and the calls still running are
+cancelled.
+
+The hedge delay adapts to the route: it is the HEDGE_QUANTILE latency of recent
+first attempts, capped at the route's budget, so only the slow tail is hedged.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from langchain_core.messages import AIMessageChunk
+
+from backend import metrics
+from backend.suggest import LLMConfig, LLMRoute, response_json, telemetry
+
+HEDGE_QUANTILE = float(os.environ.get("LLM_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "0.5"))
+# until this many latencies are observed, the hedge delay is the budget
+HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.environ.get("LLM_HEDGE_WINDOW", "200"))
+
+T = TypeVar("T")
+
+llm_hedges = metrics.Counter("llm_hedges_total", "Backup LLM calls sent after the hedge delay")
+llm_hedge_backup_wins = metrics.Counter(
+    "llm_hedge_backup_wins_total", "Hedged LLM calls answered by a backup call"
+)
+llm_hedge_wasted_tokens = metrics.Counter(
+    "llm_hedge_wasted_tokens_total",
+    "Tokens of LLM calls whose response was not used (estimated for cancelled calls)",
+)
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    # backup requests sent because the hedge delay passed
+    hedges: int = 0
+    # calls answered by a backup request
+    backup_wins: int = 0
+    # requests that failed or returned an invalid response
+    failed_attempts: int = 0
+    # calls where every request failed
+    failures: int = 0
+    # tokens of requests whose response was not used: the usage of invalid
+    # responses, and the estimated prompt tokens of cancelled requests
+    wasted_tokens: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=HEDGE_WINDOW), repr=False)
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedges / self.calls if self.calls else 0.0
+
+
+stats: Dict[str, HedgeStats] = {}
+
+
+def hedge_delay(route: LLMRoute) -> float:
+    route_stats = stats.get(route.endpoint)
+    if route_stats is None or len(route_stats.latencies) < HEDGE_MIN_SAMPLES:
+        return route.budget
+    latencies = sorted(route_stats.latencies)
+    observed = latencies[min(len(latencies) - 1, int(HEDGE_QUANTILE * len(latencies)))]
+    return min(route.budget, max(HEDGE_MIN_DELAY, observed))
+
+
+def llm_kwargs(config: LLMConfig) -> dict:
+    if config.mode == "structured" and config.provider != "anthropic":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+async def invoke(route: LLMRoute, prompt: str, parse: Callable[[Any], T]) -> T:
+    """Call the route's models with the prompt and return the first response
+    that `parse` accepts. `parse` gets the JSON object in the response, repaired
+    if needed, and raises if it is not valid; each model is then asked once
+    more. Raises the last error if every model fails."""
+    route_stats = stats.setdefault(route.endpoint, HedgeStats())
+    route_stats.calls += 1
+
+    def waste(response: AIMessageChunk) -> None:
+        usage = response.usage_metadata
+        if usage:
+            route_stats.wasted_tokens += usage["total_tokens"]
+            llm_hedge_wasted_tokens.inc(usage["total_tokens"], endpoint=route.endpoint)
+
+    async def attempt(config: LLMConfig, first: bool) -> T:
+        start = time.perf_counter()
+        try:
+            response = await telemetry.invoke(route.endpoint, config, prompt, **llm_kwargs(config))
+        except asyncio.CancelledError:
+            # the latency was at least this long; keeps the hedge delay from
+            # drifting down when slow first attempts are always cancelled
+            if first:
+                route_stats.latencies.append(time.perf_counter() - start)
+            raise
+        if first:
+            route_stats.latencies.append(time.perf_counter() - start)
+        return await response_json.parse_with_retry(
+            route.endpoint, config, prompt, response, parse, waste, **llm_kwargs(config)
+        )
+
+    # task -> index of its config in the route
+    pending: Dict[asyncio.Task, int] = {}
+    launched = 0
+    last_error: Optional[Exception] = None
+    answered = False
+
+    def launch() -> None:
+        nonlocal launched
+        config = route.configs[launched]
+        pending[asyncio.create_task(attempt(config, first=launched == 0))] = launched
+        launched += 1
+
+    launch()
+    try:
+        while pending:
+            can_hedge = launched < len(route.configs)
+            delay = hedge_delay(route) if can_hedge else None
+            done, _ = await asyncio.wait(
+                pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                route_stats.hedges += 1
+                llm_hedges.inc(endpoint=route.endpoint)
+                print(
+                    f"⚡ No {route.endpoint} response after {delay:.1f}s, "
+                    f"hedging with {route.configs[launched].model_name}"
+                )
+                launch()
+                continue
+            for task in done:
+                index = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as error:
+                    print(
+                        f"❌ {route.endpoint} call to {route.configs[index].model_name} failed:",
+                        error,
+                    )
+                    route_stats.failed_attempts += 1
+                    last_error = error
+                    # fall back right away instead of waiting out the delay
+                    if not pending and launched < len(route.configs):
+                        launch()
+                    continue
+                if index > 0:
+                    route_stats.backup_wins += 1
+                    llm_hedge_backup_wins.inc(endpoint=route.endpoint)
+                answered = True
+                return result
+        route_stats.failures += 1
+        assert last_error is not None
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+            if answered:
+                route_stats.wasted_tokens += _estimate_tokens(prompt)
+                llm_hedge_wasted_tokens.inc(_estimate_tokens(prompt), endpoint=route.endpoint)
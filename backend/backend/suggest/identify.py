@@ -2,15 +2,36 @@
 Identify a column's type via LLM
 """
 
-import json
-from typing import List, Optional
+import asyncio
+import collections
+import os
+from typing import AsyncIterator, List, Optional, Set
 
 from fastapi import HTTPException
+from pydantic import field_validator
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import Field, SQLModel, select
+from sqlmodel import Field, SQLModel
 
-from backend.models import CustomType
-from backend.suggest import create_llm, structured_llm_config
+from backend import admission, cancellation, db
+from backend.models import (
+    ColumnIdentification,
+    ColumnSuggestedAction,
+    TableIdentification,
+)
+from backend.suggest import (
+    catalog,
+    classify,
+    hedge,
+    identify_cache,
+    identify_llm_route,
+    rank,
+    single_flight,
+    structured_llm_config,
+)
+from backend.suggest.catalog import Catalog, CatalogType
+from backend.suggest.enum_match import match_enum_type
 
 
 class Identification(SQLModel):
@@ -31,7 +52,42 @@ class IdentifyColumnArgs(SQLModel):
     sample_values: List[str]
 
 
-def generate_type_prompt(custom_types: List[CustomType]) -> str:
+class IdentifyTableColumn(SQLModel):
+    column_index: int
+    column_name: str
+    sample_values: List[str]
+
+
+class IdentifyTableArgs(SQLModel):
+    prefixed_id: str
+    has_header: bool
+    columns: List[IdentifyTableColumn]
+
+    @field_validator("columns")
+    @classmethod
+    def unique_column_indexes(cls, columns: List[IdentifyTableColumn]) -> List[IdentifyTableColumn]:
+        # one upsert saves every column, and Postgres rejects a row twice in it
+        counts = collections.Counter(column.column_index for column in columns)
+        duplicates = sorted(index for index, count in counts.items() if count > 1)
+        if duplicates:
+            raise ValueError(f"Duplicate column_index values: {duplicates}")
+        return columns
+
+
+class IdentifyTableResult(SQLModel):
+    # None for an error about the whole table, e.g. failing to save it
+    column_index: Optional[int] = None
+    identification: Optional[Identification] = None
+    error: Optional[str] = None
+
+
+IDENTIFY_TABLE_CONCURRENCY = int(os.environ.get("IDENTIFY_TABLE_CONCURRENCY", "8"))
+
+# saves of tables whose client disconnected, kept until they finish
+_background_saves: Set[asyncio.Task] = set()
+
+
+def generate_type_prompt(custom_types: List[CatalogType]) -> str:
     """Generate the prompt for type identification."""
     base_prompt = """Identify the type of data in this column. Choose from:
 
@@ -72,33 +128,79 @@ Provide your response in JSON format with these fields:
     return base_prompt
 
 
-async def identify_column(
-    args: IdentifyColumnArgs,
-    session: AsyncSession,
-    user_id: str,
+def _apply_custom_type(identification: Identification, custom_type: CatalogType) -> None:
+    """Update the identification with the custom type's info."""
+    identification.is_custom = True
+    identification.id = custom_type.id
+    identification.name = custom_type.name
+    identification.kind = custom_type.kind
+    identification.min_value = custom_type.min_value
+    identification.max_value = custom_type.max_value
+    identification.log_scale = custom_type.log_scale
+
+
+async def identify_with_custom_types(
+    column_name: str,
+    sample_values: List[str],
+    custom_type_catalog: Catalog,
 ) -> Identification:
-    """
-    Identify the type of data in a column using LLM.
-    """
+    """Identify a column against an already loaded custom type catalog. Does
+    not touch the database."""
+    custom_types = custom_type_catalog.types
     try:
-        # Fetch custom types if user is authenticated
-        custom_types_query = select(CustomType).where(
-            (CustomType.user_id == user_id) | (CustomType.public == True)  # noqa: E712
+        enum_match = await match_enum_type(sample_values, custom_types)
+    except Exception as e:
+        print("Enum matching unavailable:", e)
+        enum_match = None
+    if enum_match is not None:
+        enum_type, ratio = enum_match
+        print(f"⚡ Identified {column_name} as enum type {enum_type.name} ({ratio:.0%} match)")
+        identification = Identification.model_validate(
+            {
+                "type": enum_type.name,
+                "description": (
+                    f"{enum_type.description} ({ratio:.0%} of the sample values are known "
+                    "values of this type)"
+                ),
+            }
         )
-        custom_types = list((await session.execute(custom_types_query)).scalars().all())
+        _apply_custom_type(identification, enum_type)
+        return identification
 
-        prompt = f"""Analyze this column of data:
-Column Name: {args.column_name}
-Sample Values: {', '.join(args.sample_values)}
+    classification = classify.classify_column(column_name, sample_values, custom_types)
+    if classification is not None:
+        print(
+            f"⚡ Identified {column_name} locally as {classification.type} "
+            f"(short-circuit rate {classify.stats.short_circuit_rate:.0%})"
+        )
+        return Identification.model_validate(
+            {"type": classification.type, "description": classification.description}
+        )
 
-{generate_type_prompt(custom_types)}"""
+    key = identify_cache.cache_key(column_name, sample_values, custom_type_catalog.version)
+    try:
+        cached = await identify_cache.get(key)
+        if cached is not None:
+            return Identification.model_validate_json(cached)
+    except Exception as e:
+        print("Identify cache unavailable:", e)
 
-        llm = create_llm(structured_llm_config)
-        response = await llm.ainvoke(prompt, response_format={"type": "json_object"})
-        suggestion_data = json.loads(str(response.content))
+    async def identify_with_llm() -> str:
+        # only the most relevant custom types go in the prompt
+        candidates = await asyncio.to_thread(
+            rank.select_candidates, column_name, sample_values, custom_types
+        )
+
+        prompt = f"""Analyze this column of data:
+Column Name: {column_name}
+Sample Values: {', '.join(sample_values)}
+
+{generate_type_prompt(candidates)}"""
 
         # Create the base identification
-        identification = Identification(**suggestion_data)
+        identification = await hedge.invoke(
+            identify_llm_route, prompt, lambda data: Identification(**data)
+        )
 
         # Check if it matches a custom type
         if custom_types:
@@ -107,24 +209,215 @@ Sample Values: {', '.join(args.sample_values)}
                 None,
             )
             if custom_match:
-                # Update with custom type info
-                identification.is_custom = True
-                identification.id = str(custom_match.id)
-                identification.name = custom_match.name
-                identification.kind = custom_match.kind
-                identification.min_value = (
-                    float(custom_match.min_value) if custom_match.min_value is not None else None
-                )
-                identification.max_value = (
-                    float(custom_match.max_value) if custom_match.max_value is not None else None
-                )
-                identification.log_scale = custom_match.log_scale
+                _apply_custom_type(identification, custom_match)
 
-        return identification
+        result = identification.model_dump_json(by_alias=True)
+        try:
+            await identify_cache.put(key, result)
+        except Exception as e:
+            print("Identify cache unavailable:", e)
+        return result
 
+    # identical columns identified at the same time share one LLM call
+    flight_key = single_flight.key(
+        "identify",
+        column_name=column_name,
+        sample_values=sample_values,
+        catalog_version=custom_type_catalog.version,
+    )
+    return Identification.model_validate_json(
+        await single_flight.run(flight_key, "identify", identify_with_llm)
+    )
+
+
+async def identify_column(
+    args: IdentifyColumnArgs,
+    session: AsyncSession,
+    user_id: str,
+) -> Identification:
+    """
+    Identify the type of data in a column using LLM.
+    """
+    try:
+        custom_type_catalog = await catalog.load_catalog(session, user_id)
+        return await identify_with_custom_types(
+            args.column_name, args.sample_values, custom_type_catalog
+        )
     except Exception as error:
         print("❌ Error identifying column:", error)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to identify column with {structured_llm_config.model_name}",
         )
+
+
+async def identify_table(
+    args: IdentifyTableArgs,
+    user_id: str,
+) -> AsyncIterator[IdentifyTableResult]:
+    """
+    Identify every column of a table, yielding results as they finish.
+
+    The custom type catalog is loaded once, at most IDENTIFY_TABLE_CONCURRENCY
+    columns are identified at a time, each in a bulk admission slot, and the
+    successful identifications are saved to column_identification in one bulk
+    upsert before the last result is yielded. If saving fails, a result with
+    only an error follows. If the client disconnects, the columns finished so
+    far are still saved.
+    """
+    async with db.get_read_session_for_user(user_id) as session:
+        custom_type_catalog = await catalog.load_catalog(session, user_id)
+
+    semaphore = asyncio.Semaphore(IDENTIFY_TABLE_CONCURRENCY)
+
+    async def identify_one(column: IdentifyTableColumn) -> IdentifyTableResult:
+        async with semaphore:
+            try:
+                # bulk: single-column requests from other users go first
+                async with admission.controller.slot(
+                    user_id, admission.BULK, admission.BULK_TIMEOUT
+                ):
+                    # each column gets a request's time for its LLM call
+                    cancellation.set_deadline()
+                    identification = await identify_with_custom_types(
+                        column.column_name, column.sample_values, custom_type_catalog
+                    )
+                return IdentifyTableResult(
+                    column_index=column.column_index, identification=identification
+                )
+            except admission.AdmissionRejected as error:
+                print(f"❌ No slot to identify column {column.column_name}:", error)
+                return IdentifyTableResult(
+                    column_index=column.column_index,
+                    error="The server is busy. Please try again shortly.",
+                )
+            except Exception as error:
+                print(f"❌ Error identifying column {column.column_name}:", error)
+                return IdentifyTableResult(
+                    column_index=column.column_index,
+                    error=f"Failed to identify column with {structured_llm_config.model_name}",
+                )
+
+    tasks = [asyncio.create_task(identify_one(column)) for column in args.columns]
+    identified: List[IdentifyTableResult] = []
+    saved = False
+    try:
+        for done, next_result in enumerate(asyncio.as_completed(tasks), 1):
+            result = await next_result
+            if result.identification is not None:
+                identified.append(result)
+            save_error = None
+            if done == len(tasks):
+                # so that a client that got every result can rely on the save
+                try:
+                    await _save_identified(user_id, args, identified)
+                except Exception as error:
+                    print("❌ Error saving column identifications:", error)
+                    save_error = IdentifyTableResult(
+                        error="Failed to save the column identifications"
+                    )
+                saved = True
+            yield result
+            if save_error is not None:
+                yield save_error
+    finally:
+        # e.g. the client disconnected
+        for task in tasks:
+            task.cancel()
+        if not saved and identified:
+            # in a task of its own, since this one may be getting cancelled
+            save = asyncio.create_task(_save_identified(user_id, args, list(identified)))
+            _background_saves.add(save)
+            save.add_done_callback(_log_background_save)
+
+
+def _log_background_save(save: asyncio.Task) -> None:
+    _background_saves.discard(save)
+    if not save.cancelled() and save.exception() is not None:
+        print("❌ Error saving column identifications:", save.exception())
+
+
+async def _save_identified(
+    user_id: str, args: IdentifyTableArgs, identified: List[IdentifyTableResult]
+) -> None:
+    if not identified:
+        return
+    async with db.get_session_for_user(user_id) as session:
+        async with session.begin():
+            await save_column_identifications(session, user_id, args, identified)
+
+
+async def save_column_identifications(
+    session: AsyncSession,
+    user_id: str,
+    args: IdentifyTableArgs,
+    results: List[IdentifyTableResult],
+) -> None:
+    """Upsert the table's column identifications and their suggested actions
+    in bulk."""
+    table_id = (
+        await session.execute(
+            insert(TableIdentification)
+            .values(prefixed_id=args.prefixed_id, user_id=user_id, has_header=args.has_header)
+            .on_conflict_do_update(
+                index_elements=["prefixed_id", "user_id"],
+                set_={"has_header": args.has_header, "updated_at": func.now()},
+            )
+            .returning(TableIdentification.id)
+        )
+    ).scalar_one()
+
+    rows = []
+    for result in results:
+        identification = result.identification
+        assert identification is not None
+        rows.append(
+            {
+                "table_identification_id": table_id,
+                "column_index": result.column_index,
+                "type": identification.type,
+                "description": identification.description,
+                "is_custom": identification.is_custom,
+                "external_id": identification.id,
+                "external_name": identification.name,
+                "external_kind": identification.kind,
+                "min_value": identification.min_value,
+                "max_value": identification.max_value,
+                "log_scale": identification.log_scale,
+            }
+        )
+    statement = insert(ColumnIdentification).values(rows)
+    column_ids = dict(
+        (
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["table_identification_id", "column_index"],
+                    set_={
+                        **{
+                            key: statement.excluded[key]
+                            for key in rows[0]
+                            if key not in ("table_identification_id", "column_index")
+                        },
+                        "updated_at": func.now(),
+                    },
+                ).returning(ColumnIdentification.column_index, ColumnIdentification.id)
+            )
+        )
+        .tuples()
+        .all()
+    )
+
+    # replace suggested actions, like the frontend does
+    await session.execute(
+        delete(ColumnSuggestedAction).where(
+            ColumnSuggestedAction.column_identification_id.in_(column_ids.values())
+        )
+    )
+    actions = [
+        {"column_identification_id": column_ids[result.column_index], "action": action}
+        for result in results
+        if result.identification is not None and result.column_index is not None
+        for action in result.identification.suggested_actions or []
+    ]
+    if actions:
+        await session.execute(insert(ColumnSuggestedAction).values(actions))
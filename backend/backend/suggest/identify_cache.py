@@ -0,0 +1,77 @@
+"""
+Redis cache of identify_column results, keyed by column fingerprint
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import List, Set
+
+from backend.redis_client import get_redis
+
+KEY_PREFIX = "br-identify-"
+INDEX_KEY = "br-identify-index"
+STATS_KEY = "br-identify-stats"
+
+TTL = int(os.environ.get("IDENTIFY_CACHE_TTL", str(7 * 24 * 60 * 60)))
+MAX_ENTRIES = int(os.environ.get("IDENTIFY_CACHE_MAX_ENTRIES", "100000"))
+
+# stats updates still running, kept so they are not garbage collected
+_stats_updates: Set[asyncio.Task] = set()
+
+
+def _normalize_column_name(column_name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", column_name.lower()).strip("-")
+
+
+def cache_key(column_name: str, sample_values: List[str], version: str) -> str:
+    values_hash = hashlib.sha256(json.dumps(sorted(sample_values)).encode()).hexdigest()[:32]
+    return f"{KEY_PREFIX}{_normalize_column_name(column_name)}:{values_hash}:{version}"
+
+
+def _log_stats_update(update: asyncio.Task) -> None:
+    _stats_updates.discard(update)
+    if not update.cancelled() and update.exception() is not None:
+        print("Identify cache stats not updated:", update.exception())
+
+
+async def get(key: str) -> str | None:
+    """Get the cached Identification JSON and count the hit or miss. The count
+    is not waited for, so a lookup is one round trip."""
+    redis = get_redis()
+    value = await redis.get(key)
+    update = asyncio.create_task(
+        redis.hincrby(STATS_KEY, "hits" if value is not None else "misses", 1)
+    )
+    _stats_updates.add(update)
+    update.add_done_callback(_log_stats_update)
+    return value.decode() if value is not None else None
+
+
+async def put(key: str, value: str) -> None:
+    """Store Identification JSON for TTL seconds. Once there are more than
+    MAX_ENTRIES entries, the oldest ones are evicted."""
+    redis = get_redis()
+    now = time.time()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(key, value, ex=TTL)
+        pipe.zadd(INDEX_KEY, {key: now})
+        # entries that expired on their own
+        pipe.zremrangebyscore(INDEX_KEY, "-inf", now - TTL)
+        pipe.zcard(INDEX_KEY)
+        *_, count = await pipe.execute()
+
+    if count > MAX_ENTRIES:
+        evicted = [key for key, _ in await redis.zpopmin(INDEX_KEY, count - MAX_ENTRIES)]
+        if evicted:
+            await redis.delete(*evicted)
+            await redis.hincrby(STATS_KEY, "evictions", len(evicted))
+
+
+async def get_stats() -> dict[str, int]:
+    """Hit, miss and eviction counts across all workers."""
+    stats = await get_redis().hgetall(STATS_KEY)
+    return {k.decode(): int(v) for k, v in stats.items()}
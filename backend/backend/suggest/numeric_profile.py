@@ -0,0 +1,110 @@
+"""
+Profile numeric columns locally, for custom type ranges and scales
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from backend.validate import DECIMAL_PATTERN
+
+MAX_VALUES = int(os.environ.get("NUMERIC_PROFILE_MAX_VALUES", "100000"))
+# recommend a log scale when the middle 90% of values spans this many powers
+# of ten
+LOG_SCALE_MIN_DECADES = float(os.environ.get("NUMERIC_PROFILE_LOG_SCALE_MIN_DECADES", "2"))
+# ... and the median sits in the bottom tenth of that range
+LOG_SCALE_MAX_MEDIAN_POSITION = 0.1
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# a suggested bound is zero when the data comes within this fraction of its
+# range of zero, e.g. counts from 3 to 900, but not years from 1990 to 2020
+ZERO_SNAP_FRACTION = 0.1
+MIN_VALUES = 3
+
+
+@dataclass
+class NumericProfile:
+    count: int
+    # includes missing values
+    non_numeric: int
+    min: float
+    max: float
+    quantiles: Dict[float, float]
+    # powers of ten between the smallest and largest positive magnitudes
+    decades: float
+    log_scale: bool
+    suggested_min: float
+    suggested_max: float
+
+
+def _sample(values: List[str], size: int) -> List[str]:
+    """Evenly spaced values, so sorted or grouped columns are still covered."""
+    if len(values) <= size:
+        return values
+    step = len(values) / size
+    return [values[int(i * step)] for i in range(size)]
+
+
+def _nice_bounds(low: float, high: float) -> Tuple[float, float]:
+    """Round the range outwards to two significant digits of its width, e.g.
+    3.2..873.2 -> 0..880 and 1990..2020 -> 1990..2020."""
+    width = high - low or abs(high) or 1.0
+    if not math.isfinite(width):
+        # e.g. -1e308..1e308
+        return low, high
+    step = 10 ** (math.floor(math.log10(width)) - 1)
+    lower = math.floor(low / step) * step
+    upper = math.ceil(high / step) * step
+    if 0 <= low <= width * ZERO_SNAP_FRACTION:
+        lower = 0
+    if -width * ZERO_SNAP_FRACTION <= high <= 0:
+        upper = 0
+    # round off float error, e.g. 0.88000000000001
+    return float(f"{lower:.12g}"), float(f"{upper:.12g}")
+
+
+def profile_values(values: List[str], kind: str = "decimal") -> Optional[NumericProfile]:
+    """Range, quantiles and scale of the numeric values, from at most
+    MAX_VALUES of them. Returns None when fewer than MIN_VALUES parse."""
+    sample = _sample(values, MAX_VALUES)
+    matches = [m for m in map(DECIMAL_PATTERN.fullmatch, map(str.strip, sample)) if m]
+    # e.g. "1e400" parses to inf
+    numbers = sorted(
+        number
+        for number in (float(m.group().replace(",", "")) for m in matches)
+        if math.isfinite(number)
+    )
+    if len(numbers) < MIN_VALUES:
+        return None
+
+    def quantile(q: float) -> float:
+        return numbers[min(len(numbers) - 1, int(q * len(numbers)))]
+
+    quantiles = {q: quantile(q) for q in QUANTILES}
+    positive = [x for x in (abs(x) for x in numbers) if x > 0]
+    decades = math.log10(max(positive) / min(positive)) if positive else 0.0
+    low, median, high = quantiles[0.05], quantiles[0.5], quantiles[0.95]
+    # wide and right-skewed, i.e. most values are bunched near the bottom of a
+    # linear axis
+    log_scale = (
+        low > 0
+        and math.log10(high / low) >= LOG_SCALE_MIN_DECADES
+        and (median - low) / (high - low) < LOG_SCALE_MAX_MEDIAN_POSITION
+    )
+
+    suggested_min, suggested_max = _nice_bounds(numbers[0], numbers[-1])
+    if kind == "integer":
+        suggested_min = float(math.floor(suggested_min))
+        suggested_max = float(math.ceil(suggested_max))
+
+    return NumericProfile(
+        count=len(numbers),
+        non_numeric=len(sample) - len(numbers),
+        min=numbers[0],
+        max=numbers[-1],
+        quantiles=quantiles,
+        decades=decades,
+        log_scale=log_scale,
+        suggested_min=suggested_min,
+        suggested_max=suggested_max,
+    )
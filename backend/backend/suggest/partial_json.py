@@ -0,0 +1,91 @@
+"""
+Incrementally parse a JSON object as it streams in from an LLM
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class TopLevelFieldParser:
+    """Scans a streamed JSON object and returns each top-level field as soon as
+    its value is complete.
+
+    Text before the first `{` (e.g. a code fence) is skipped. Each character is
+    looked at once, so feeding a long completion in small chunks is linear.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expecting_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.done = False
+
+    def _complete_value(self, end: int) -> Optional[Tuple[str, Any]]:
+        if self._key is None or self._value_start is None:
+            return None
+        raw = self.text[self._value_start : end]
+        key = self._key
+        self._key = None
+        self._value_start = None
+        try:
+            # allows raw newlines in strings, e.g. in observablePlotCode
+            return key, json.loads(raw, strict=False)
+        except ValueError:
+            # not streamed; the whole response is repaired at the end
+            return None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add the next chunk. Returns the (key, value) pairs it completed."""
+        self.text += chunk
+        fields = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start : i + 1])
+                        self._key_start = None
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._expecting_key = True
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expecting_key:
+                    self._key_start = i
+                    self._expecting_key = False
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    field = self._complete_value(i)
+                    if field is not None:
+                        fields.append(field)
+                    self.done = True
+            elif self._depth == 1:
+                if c == ":":
+                    self._value_start = i + 1
+                elif c == ",":
+                    field = self._complete_value(i)
+                    if field is not None:
+                        fields.append(field)
+                    self._expecting_key = True
+        self._pos = len(text)
+        return fields
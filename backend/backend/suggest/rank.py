@@ -0,0 +1,111 @@
+"""
+Rank custom types by relevance to a column, to keep identify prompts small
+"""
+
+import math
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from backend.suggest.catalog import CatalogType
+
+MAX_CANDIDATES = int(os.environ.get("IDENTIFY_MAX_CUSTOM_TYPES", "20"))
+DIMENSIONS = 1 << 14
+# custom type vectors kept in each worker's memory, across every user's catalog;
+# about 10 KiB each
+INDEX_SIZE = int(os.environ.get("IDENTIFY_RANK_INDEX_SIZE", "20000"))
+
+Vector = Dict[int, float]
+
+
+def _trigrams(text: str) -> Iterable[str]:
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i : i + 3]
+
+
+def embed(texts: Iterable[Tuple[str, float]]) -> Vector:
+    """Hashed, L2-normalized bag of character trigrams over weighted texts."""
+    counts: Dict[int, float] = defaultdict(float)
+    for text, weight in texts:
+        for trigram in _trigrams(text):
+            counts[zlib.crc32(trigram.encode()) % DIMENSIONS] += weight
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {k: v / norm for k, v in counts.items()} if norm else {}
+
+
+def similarity(a: Vector, b: Vector) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def _embed_custom_type(type_: CatalogType) -> Vector:
+    return embed(
+        [
+            (type_.name.replace("-", " "), 3.0),
+            (type_.description, 1.0),
+            (" ".join(type_.rules or []), 1.0),
+            (" ".join(type_.examples or []), 2.0),
+        ]
+    )
+
+
+class CustomTypeIndex:
+    """In-process index of custom type vectors, keyed by id, shared by every
+    user's catalog.
+
+    `vectors` only embeds types that are new or whose updated_at changed, and
+    keeps the others' entries, so users with different private types do not
+    evict each other and the public types are embedded once. Entries not used
+    recently are dropped past `size`, which also clears out deleted types.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, size: int = INDEX_SIZE) -> None:
+        self.size = size
+        self._entries: OrderedDict[str, Tuple[object, Vector]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def vectors(self, custom_types: List[CatalogType]) -> List[Vector]:
+        """The types' vectors, in order."""
+        with self._lock:
+            vectors = []
+            for type_ in custom_types:
+                key = str(type_.id)
+                entry = self._entries.get(key)
+                if entry is None or entry[0] != type_.updated_at:
+                    entry = (type_.updated_at, _embed_custom_type(type_))
+                    self._entries[key] = entry
+                self._entries.move_to_end(key)
+                vectors.append(entry[1])
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            return vectors
+
+
+index = CustomTypeIndex()
+
+
+def select_candidates(
+    column_name: str,
+    sample_values: List[str],
+    custom_types: List[CatalogType],
+    k: int = MAX_CANDIDATES,
+) -> List[CatalogType]:
+    """The k custom types most similar to the column name and sample values,
+    most similar first. Returns the catalog unchanged if it has k types or
+    fewer. CPU-bound on large catalogs: call it from a thread."""
+    if len(custom_types) <= k:
+        return custom_types
+    query = embed([(column_name, 2.0), (" ".join(sample_values), 1.0)])
+    scores = [similarity(query, vector) for vector in index.vectors(custom_types)]
+    order = sorted(range(len(custom_types)), key=scores.__getitem__, reverse=True)
+    return [custom_types[i] for i in order[:k]]
@@ -0,0 +1,207 @@
+"""
+Parse the JSON object in an LLM response, repairing it if needed
+
+Models wrap their JSON in code fences or prose, leave trailing commas, quote
+with single quotes, and put raw newlines in strings such as
+observablePlotCode. `loads` fixes those without another LLM call. A response
+that still cannot be used is sent back to the model once, with what was wrong
+(`parse_with_retry`).
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from langchain_core.messages import AIMessageChunk
+
+from backend import metrics
+from backend.suggest import LLMConfig, telemetry
+
+T = TypeVar("T")
+
+# how much of an invalid response to quote back to the model
+RETRY_QUOTE_CHARS = 4000
+
+llm_response_repairs = metrics.Counter(
+    "llm_response_repairs_total", "LLM responses that were only valid JSON after a repair"
+)
+llm_response_retries = metrics.Counter(
+    "llm_response_retries_total",
+    "LLM calls repeated because the response could not be repaired or did not fit the schema",
+)
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*\n(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*[}\]]")
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_JSON_ESCAPES = frozenset('"\\/bfnrtu')
+
+
+class ResponseError(ValueError):
+    pass
+
+
+@dataclass
+class ResponseStats:
+    responses: int = 0
+    repaired: int = 0
+    retried: int = 0
+
+    @property
+    def repair_rate(self) -> float:
+        return self.repaired / self.responses if self.responses else 0.0
+
+    @property
+    def retry_rate(self) -> float:
+        return self.retried / self.responses if self.responses else 0.0
+
+
+stats: Dict[str, ResponseStats] = {}
+
+
+def extract_object(text: str) -> str:
+    """The first balanced {...} in the text, preferring the inside of a code
+    fence. Returns the rest of the text from the first `{` if it never
+    closes."""
+    fence = _FENCE.search(text)
+    if fence is not None and "{" in fence.group(1):
+        text = fence.group(1)
+    start = text.find("{")
+    if start == -1:
+        raise ResponseError("The response has no JSON object")
+    depth = 0
+    quote: Optional[str] = None
+    escape = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote is not None:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+    return text[start:]
+
+
+def repair(text: str) -> str:
+    """Fix trailing commas, single-quoted strings and raw control characters
+    in strings, in one pass over the text."""
+    out = []
+    quote: Optional[str] = None
+    escape = False
+    for i, c in enumerate(text):
+        if quote is not None:
+            if escape:
+                escape = False
+                if c == "'":
+                    out.append("'")
+                elif c in _JSON_ESCAPES:
+                    out.append("\\" + c)
+                else:
+                    # e.g. a regex in observablePlotCode; keep the backslash
+                    out.append("\\\\" + c)
+            elif c == "\\":
+                escape = True
+            elif c == quote:
+                quote = None
+                out.append('"')
+            elif c == '"':
+                # inside a single-quoted string
+                out.append('\\"')
+            elif c < " ":
+                out.append(_ESCAPES.get(c, f"\\u{ord(c):04x}"))
+            else:
+                out.append(c)
+        elif c in "\"'":
+            quote = c
+            out.append('"')
+        elif c == ",":
+            if not _TRAILING_COMMA.match(text, i):
+                out.append(c)
+        else:
+            out.append(c)
+    return "".join(out)
+
+
+def loads(content: str, endpoint: str = "", model: str = "") -> Any:
+    """The JSON object in an LLM response. Raises ResponseError if it cannot
+    be found or repaired."""
+    route_stats = stats.setdefault(endpoint, ResponseStats())
+    route_stats.responses += 1
+    try:
+        value = json.loads(content)
+    except ValueError:
+        candidate = extract_object(content)
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            try:
+                value = json.loads(repair(candidate))
+            except ValueError as error:
+                raise ResponseError(f"The response is not valid JSON: {error}") from None
+        route_stats.repaired += 1
+        llm_response_repairs.inc(endpoint=endpoint, model=model)
+        print(f"⚡ Repaired {endpoint} response (repair rate {route_stats.repair_rate:.0%})")
+    if not isinstance(value, dict):
+        raise ResponseError("The response is not a JSON object")
+    return value
+
+
+def retry_prompt(prompt: str, content: str, error: Exception) -> str:
+    """The prompt again, with the invalid response and what was wrong with it."""
+    quoted = content if len(content) <= RETRY_QUOTE_CHARS else content[:RETRY_QUOTE_CHARS] + "..."
+    return f"""{prompt}
+
+Your previous response could not be used:
+
+{quoted}
+
+The problem: {error}
+
+Respond again with only the corrected JSON object."""
+
+
+async def parse_with_retry(
+    endpoint: str,
+    config: LLMConfig,
+    prompt: str,
+    response: AIMessageChunk,
+    parse: Callable[[Any], T],
+    on_invalid: Optional[Callable[[AIMessageChunk], None]] = None,
+    **kwargs,
+) -> T:
+    """`parse` the JSON object in the response, e.g. by validating it with a
+    SQLModel. If it cannot be repaired or `parse` raises, asks the model once
+    more with the same kwargs, pointing out what was wrong. `on_invalid` gets
+    every response that was not used."""
+    for retry in (False, True):
+        content = str(response.content)
+        try:
+            return parse(loads(content, endpoint, config.model_name))
+        except Exception as error:
+            telemetry.llm_parse_failures.inc(endpoint=endpoint, model=config.model_name)
+            if on_invalid is not None:
+                on_invalid(response)
+            if retry:
+                raise
+            route_stats = stats.setdefault(endpoint, ResponseStats())
+            route_stats.retried += 1
+            llm_response_retries.inc(endpoint=endpoint, model=config.model_name)
+            print(
+                f"⚡ Retrying invalid {endpoint} response (retry rate "
+                f"{route_stats.retry_rate:.0%}):",
+                error,
+            )
+            response = await telemetry.invoke(
+                endpoint, config, retry_prompt(prompt, content, error), **kwargs
+            )
+    raise AssertionError("unreachable")
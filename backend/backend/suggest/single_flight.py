@@ -0,0 +1,135 @@
+"""
+Share one LLM call between identical concurrent requests
+
+Double clicks, re-renders and open tabs send the same /identify/column or
+/suggest/custom-type request several times at once. `run` makes the first one
+the leader and has the others wait for its result: in one worker through a
+shared task, and across workers through a Redis lock, with the leader's result
+left in Redis for the other workers' followers.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend import cancellation, metrics
+from backend.redis_client import get_redis
+
+KEY_PREFIX = "br-single-flight-"
+# seconds a follower in another worker waits between checks for the result
+POLL_INTERVAL = float(os.environ.get("SINGLE_FLIGHT_POLL_INTERVAL", "0.1"))
+# seconds the leader's result stays in Redis for followers to pick up
+RESULT_TTL = int(os.environ.get("SINGLE_FLIGHT_RESULT_TTL", "10"))
+
+coalesced = metrics.Counter(
+    "single_flight_coalesced_total",
+    "Requests answered by an identical request's LLM call, within a worker or across workers",
+)
+
+# compare-and-delete, so a leader never releases a lock that expired and was
+# taken by someone else
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def key(endpoint: str, **parts: Any) -> str:
+    """A canonical hash of the parts, e.g. the request args and the catalog
+    version."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{endpoint}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+_flights: Dict[str, _Flight] = {}
+
+
+async def _wait_for_leader(redis, lock_key: str, result_key: str) -> Optional[str]:
+    """The leader's result, or None if it gave up without one."""
+    while True:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(result_key)
+            pipe.exists(lock_key)
+            result, locked = await pipe.execute()
+        if result is not None:
+            return result.decode()
+        if not locked:
+            return None
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def _lead(flight_key: str, endpoint: str, work: Callable[[], Awaitable[str]]) -> str:
+    """Run `work` for this worker, unless another worker already is."""
+    lock_key = f"{KEY_PREFIX}lock-{flight_key}"
+    result_key = f"{KEY_PREFIX}result-{flight_key}"
+    token = uuid.uuid4().hex
+    try:
+        redis = get_redis()
+        # held for as long as a request may take, in case the leader dies
+        acquired = await redis.set(
+            lock_key, token, nx=True, px=int(cancellation.REQUEST_TIMEOUT * 1000)
+        )
+        if acquired:
+            # a result from an earlier flight is not this one's
+            await redis.delete(result_key)
+        else:
+            result = await _wait_for_leader(redis, lock_key, result_key)
+            if result is not None:
+                coalesced.inc(endpoint=endpoint, scope="redis")
+                return result
+            # the leader failed or was cancelled; try it here
+    except Exception as e:
+        print("Single-flight lock unavailable:", e)
+        return await work()
+
+    try:
+        result = await work()
+        if acquired:
+            try:
+                await redis.set(result_key, result, ex=RESULT_TTL)
+            except Exception as e:
+                print("Single-flight result not shared:", e)
+        return result
+    finally:
+        if acquired:
+            try:
+                await redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                print("Single-flight lock not released:", e)
+
+
+async def run(flight_key: str, endpoint: str, work: Callable[[], Awaitable[str]]) -> str:
+    """Return the result of `work`, shared with every concurrent call with the
+    same key. The result is a string, e.g. JSON, so it can cross workers.
+
+    `work` runs in its own task, so it must not use the caller's database
+    session. It is cancelled once every caller waiting for it is.
+    """
+    flight = _flights.get(flight_key)
+    if flight is None:
+        flight = _Flight(asyncio.create_task(_lead(flight_key, endpoint, work)))
+        _flights[flight_key] = flight
+        flight.task.add_done_callback(lambda _: _flights.pop(flight_key, None))
+    else:
+        coalesced.inc(endpoint=endpoint, scope="process")
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # nobody is waiting any more, e.g. every client disconnected
+            flight.task.cancel()
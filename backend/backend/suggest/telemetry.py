@@ -0,0 +1,144 @@
+"""
+Metrics for every LLM call, exported on /metrics
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import add_ai_message_chunks
+
+from backend import cancellation, metrics
+from backend.suggest import LLMConfig, create_llm
+
+llm_requests = metrics.Counter("llm_requests_total", "LLM calls by endpoint, model and HTTP status")
+llm_prompt_tokens = metrics.Counter("llm_prompt_tokens_total", "Prompt tokens sent to the LLM")
+llm_completion_tokens = metrics.Counter(
+    "llm_completion_tokens_total", "Completion tokens received from the LLM"
+)
+llm_time_to_first_token = metrics.Histogram(
+    "llm_time_to_first_token_seconds", "Time from sending an LLM call to its first content"
+)
+llm_duration = metrics.Histogram(
+    "llm_request_duration_seconds", "Time from sending a successful LLM call to its last token"
+)
+llm_tokens_saved = metrics.Counter(
+    "llm_cancelled_tokens_saved_total",
+    "Estimated completion tokens not generated because an LLM call was cancelled or timed out",
+)
+llm_parse_failures = metrics.Counter(
+    "llm_response_parse_failures_total",
+    "LLM responses that were not valid JSON or did not fit the expected schema",
+)
+
+
+# moving average of completion tokens by (endpoint, model), to estimate what a
+# cancelled call would have cost
+_completion_tokens: Dict[Tuple[str, str], float] = {}
+
+
+def _status(error: BaseException) -> str:
+    # cancelled, or the client went away during a stream
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    # the request's deadline, or the client's own timeout
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return "timeout"
+    # openai and anthropic API errors carry the response status
+    status = getattr(error, "status_code", None)
+    return str(status) if status is not None else "error"
+
+
+class LLMCall:
+    """Records the metrics of one LLM call. Pass every streamed chunk to
+    `chunk`, then call `finish` or `fail`. A cancelled call counts the
+    completion tokens it likely saved, from the average of finished calls."""
+
+    def __init__(self, endpoint: str, config: LLMConfig):
+        self.labels = {"endpoint": endpoint, "model": config.model_name}
+        self._key = (endpoint, config.model_name)
+        self.start = time.perf_counter()
+        self.time_to_first_token: Optional[float] = None
+        self.received_chars = 0
+
+    def chunk(self, chunk: BaseMessage) -> None:
+        self.received_chars += len(str(chunk.content))
+        if self.time_to_first_token is None and chunk.content:
+            self.time_to_first_token = time.perf_counter() - self.start
+            llm_time_to_first_token.observe(self.time_to_first_token, **self.labels)
+
+    def finish(self, message: Optional[AIMessageChunk]) -> None:
+        llm_duration.observe(time.perf_counter() - self.start, **self.labels)
+        llm_requests.labels(**self.labels, status="200").inc()
+        usage = message.usage_metadata if message is not None else None
+        if usage:
+            llm_prompt_tokens.inc(usage["input_tokens"], **self.labels)
+            llm_completion_tokens.inc(usage["output_tokens"], **self.labels)
+            average = _completion_tokens.get(self._key)
+            _completion_tokens[self._key] = (
+                usage["output_tokens"]
+                if average is None
+                else 0.9 * average + 0.1 * usage["output_tokens"]
+            )
+
+    def fail(self, error: BaseException) -> None:
+        status = _status(error)
+        llm_requests.labels(**self.labels, status=status).inc()
+        expected = _completion_tokens.get(self._key)
+        if status in ("cancelled", "timeout") and expected is not None:
+            # ~4 characters per token
+            saved = max(0.0, expected - self.received_chars / 4)
+            llm_tokens_saved.inc(round(saved), **self.labels)
+
+
+def _set_client_timeout(config: LLMConfig, kwargs: dict, timeout: Optional[float]) -> None:
+    if timeout is not None and config.provider != "anthropic":
+        # bounds each HTTP request to OpenAI, but not the client's retries
+        kwargs.setdefault("timeout", timeout)
+
+
+async def invoke(endpoint: str, config: LLMConfig, prompt: str, **kwargs) -> AIMessageChunk:
+    """Call the LLM and return the whole response. The response is streamed,
+    so the time to first token is measured too. Raises TimeoutError at the
+    current request's deadline."""
+    call = LLMCall(endpoint, config)
+    message: Optional[AIMessageChunk] = None
+    timeout = cancellation.remaining()
+    _set_client_timeout(config, kwargs, timeout)
+    try:
+        async with asyncio.timeout(timeout):
+            async for chunk in create_llm(config).astream(prompt, **kwargs):
+                # chat models stream AIMessageChunks, typed as BaseMessageChunk
+                assert isinstance(chunk, AIMessageChunk)
+                call.chunk(chunk)
+                message = chunk if message is None else add_ai_message_chunks(message, chunk)
+    except BaseException as error:
+        call.fail(error)
+        raise
+    call.finish(message)
+    return message if message is not None else AIMessageChunk(content="")
+
+
+async def stream(
+    endpoint: str, config: LLMConfig, prompt: str, **kwargs
+) -> AsyncIterator[AIMessageChunk]:
+    """Call the LLM and yield the response chunks as they arrive. Raises
+    TimeoutError once the current request's deadline passes, checked between
+    chunks. Close it with contextlib.aclosing, so the LLM connection is closed
+    as soon as the caller stops."""
+    call = LLMCall(endpoint, config)
+    message: Optional[AIMessageChunk] = None
+    _set_client_timeout(config, kwargs, cancellation.remaining())
+    try:
+        async for chunk in create_llm(config).astream(prompt, **kwargs):
+            if cancellation.remaining() == 0:
+                raise TimeoutError("The request's deadline passed")
+            assert isinstance(chunk, AIMessageChunk)
+            call.chunk(chunk)
+            message = chunk if message is None else add_ai_message_chunks(message, chunk)
+            yield chunk
+    except BaseException as error:
+        call.fail(error)
+        raise
+    call.finish(message)
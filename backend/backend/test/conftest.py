@@ -0,0 +1,5 @@
+import os
+
+# importable without credentials; nothing in the tests calls an LLM or Supabase
+os.environ.setdefault("LLM_PROVIDER", "mock")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret-test-secret-test-secret")
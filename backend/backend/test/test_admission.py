@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend import admission
+from backend.admission import BULK, INTERACTIVE, AdmissionController, AdmissionRejected
+
+
+async def waiting(controller: AdmissionController, count: int) -> None:
+    # let the acquiring tasks reach the queue
+    for _ in range(10):
+        if len(controller._queue) == count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"{len(controller._queue)} waiters, expected {count}")
+
+
+async def test_interactive_requests_go_ahead_of_bulk():
+    controller = AdmissionController(max_in_flight=1)
+    held = await controller.acquire("a")
+    order = []
+
+    async def run(user_id: str, priority: int) -> None:
+        async with controller.slot(user_id, priority):
+            order.append(user_id)
+
+    tasks = [asyncio.create_task(run("bulk", BULK))]
+    await waiting(controller, 1)
+    tasks.append(asyncio.create_task(run("interactive", INTERACTIVE)))
+    await waiting(controller, 2)
+    held.release()
+    await asyncio.gather(*tasks)
+    assert order == ["interactive", "bulk"]
+    assert controller.in_flight == 0
+
+
+async def test_per_user_limit_lets_other_users_through():
+    controller = AdmissionController(max_in_flight=3, max_in_flight_per_user=1)
+    held = await controller.acquire("a")
+    second = asyncio.create_task(controller.acquire("a"))
+    await waiting(controller, 1)
+    # b is not behind a's waiter
+    other = await asyncio.wait_for(controller.acquire("b"), 0.1)
+    assert not second.done()
+
+    held.release()
+    (await second).release()
+    other.release()
+    assert controller.in_flight == 0
+    assert controller._user_in_flight == {}
+
+
+@pytest.mark.parametrize("priority", [INTERACTIVE, BULK])
+async def test_full_queue_is_rejected_at_once(priority):
+    controller = AdmissionController(
+        max_in_flight=1, max_queue=1, max_queue_per_user=1, max_bulk_queue=1
+    )
+    held = await controller.acquire("a")
+    queued = asyncio.create_task(controller.acquire("b", priority))
+    await waiting(controller, 1)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("c", priority)
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    held.release()
+    (await queued).release()
+
+
+async def test_user_queue_limit():
+    controller = AdmissionController(max_in_flight=1, max_queue_per_user=1)
+    held = await controller.acquire("a")
+    queued = asyncio.create_task(controller.acquire("b"))
+    await waiting(controller, 1)
+    with pytest.raises(AdmissionRejected, match="user_queue_full"):
+        await controller.acquire("b")
+    # another user still has room
+    other = asyncio.create_task(controller.acquire("c"))
+    await waiting(controller, 2)
+
+    held.release()
+    (await queued).release()
+    (await other).release()
+
+
+async def test_timeout_leaves_the_queue():
+    controller = AdmissionController(max_in_flight=1)
+    held = await controller.acquire("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("b", timeout=0.01)
+    assert rejected.value.reason == "deadline"
+    assert controller._queue == []
+    held.release()
+    assert controller.in_flight == 0
+
+
+async def test_cancelled_waiter_gets_no_slot():
+    controller = AdmissionController(max_in_flight=1)
+    held = await controller.acquire("a")
+    waiter = asyncio.create_task(controller.acquire("b"))
+    await waiting(controller, 1)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert controller._queue == []
+
+    held.release()
+    held.release()
+    assert controller.in_flight == 0
+    assert controller._user_in_flight == {}
+
+
+async def test_admit_raises_429_with_retry_after(monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(admission, "controller", controller)
+    async with admission.admitted("a"):
+        with pytest.raises(HTTPException) as rejected:
+            await admission.admit("b")
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers is not None
+    assert int(rejected.value.headers["Retry-After"]) >= 1
+    assert controller.in_flight == 0
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+from backend.suggest.catalog import CatalogType
+from backend.suggest.classify import classify_column, classify_values, looks_like_codes
+
+
+@pytest.mark.parametrize(
+    "values, type_",
+    [
+        (["1", "2", "3", "42"], "integer-numbers"),
+        (["1.5", "2.25", "-3e4"], "decimal-numbers"),
+        (["true", "False", "yes"], "boolean"),
+        (["2021-01-01", "2022-12-31", "1999-07-04"], "dates"),
+        (["a@b.com", "x.y@example.org", "z+1@mail.co"], "email-addresses"),
+        (["INV-00123", "INV-00124", "INV-00200"], "identifiers"),
+        (["5f2b9c0e8d1a4b3c", "0123456789abcdef", "ffffffffffffffff"], "identifiers"),
+    ],
+)
+def test_classify_values(values, type_):
+    classification = classify_values(values)
+    assert classification is not None
+    assert classification.type == type_
+
+
+def test_too_few_or_mixed_values_go_to_the_llm():
+    assert classify_values(["1", "", "n/a"]) is None
+    assert classify_values(["1", "two", "3", "four"]) is None
+
+
+@pytest.mark.parametrize(
+    "column_name, values",
+    [
+        ("zip", ["02134", "10001", "94103"]),
+        ("customer_id", ["1", "2", "3"]),
+        ("userId", ["17", "18", "19"]),
+        ("Postal Code", ["10115", "20095", "80331"]),
+        ("contact", ["5551234567", "5559876543", "5550001111"]),
+        ("code", ["007", "008", "009"]),
+    ],
+)
+def test_numeric_codes_go_to_the_llm(column_name, values):
+    assert looks_like_codes(column_name, values)
+    assert classify_column(column_name, values, []) is None
+
+
+@pytest.mark.parametrize("column_name", ["count", "population", "video", "idle_time"])
+def test_numbers_are_classified_locally(column_name):
+    classification = classify_column(column_name, ["12", "340", "5"], [])
+    assert classification is not None
+    assert classification.type == "integer-numbers"
+
+
+@pytest.mark.parametrize("column_name", ["Inflation", "noThKO", "number"])
+def test_decimals_are_classified_locally(column_name):
+    classification = classify_column(column_name, ["0.0312345678", "1.25", "12.5"], [])
+    assert classification is not None
+    assert classification.type == "decimal-numbers"
+
+
+def test_custom_type_of_the_same_kind_goes_to_the_llm():
+    custom = CatalogType(
+        id="1",
+        kind="integer",
+        name="counts",
+        description="",
+        rules=(),
+        examples=(),
+        min_value=None,
+        max_value=None,
+        log_scale=False,
+        values_key=None,
+        updated_at=datetime(2025, 1, 1),
+    )
+    assert classify_column("count", ["1", "2", "3"], [custom]) is None
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import time
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from backend import metrics
+from backend.suggest import LLMConfig, LLMRoute, hedge
+
+PRIMARY = LLMConfig(provider="mock", model_name="primary")
+BACKUP = LLMConfig(provider="mock", model_name="backup")
+PROMPT = "Identify this column. " * 20
+
+
+class StubLLM:
+    """Answers with the model's name after the model's delay, or fails."""
+
+    def __init__(self, delays: dict, failing: tuple = ()):
+        self.delays = delays
+        self.failing = failing
+        self.started: dict = {}
+        self.cancelled: list = []
+
+    async def invoke(self, endpoint: str, config: LLMConfig, prompt: str, **kwargs):
+        self.started[config.model_name] = time.perf_counter()
+        try:
+            await asyncio.sleep(self.delays[config.model_name])
+        except asyncio.CancelledError:
+            self.cancelled.append(config.model_name)
+            raise
+        if config.model_name in self.failing:
+            raise RuntimeError("500 from the provider")
+        return AIMessageChunk(content=json.dumps({"model": config.model_name}))
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    def install(delays: dict, failing: tuple = ()) -> StubLLM:
+        stub = StubLLM(delays, failing)
+        monkeypatch.setattr(hedge.telemetry, "invoke", stub.invoke)
+        return stub
+
+    return install
+
+
+def route(endpoint: str, budget: float) -> LLMRoute:
+    return LLMRoute(endpoint=endpoint, configs=(PRIMARY, BACKUP), budget=budget)
+
+
+async def invoke(route: LLMRoute) -> str:
+    return await hedge.invoke(route, PROMPT, lambda data: data["model"])
+
+
+async def test_fast_first_call_is_not_hedged(llm):
+    stub = llm({"primary": 0.01, "backup": 0.01})
+    assert await invoke(route("hedge-fast", budget=0.2)) == "primary"
+    assert "backup" not in stub.started
+    assert hedge.stats["hedge-fast"].hedges == 0
+
+
+async def test_slow_first_call_is_hedged_after_the_delay_and_cancelled(llm):
+    stub = llm({"primary": 10, "backup": 0.01})
+    wasted = f'{hedge.llm_hedge_wasted_tokens.name}{{endpoint="hedge-slow"}}'
+    before = metrics._totals.get(wasted, 0)
+
+    assert await invoke(route("hedge-slow", budget=0.1)) == "backup"
+    # with no latencies observed yet, the delay is the budget
+    assert stub.started["backup"] - stub.started["primary"] >= 0.1
+    # the loser is cancelled, and sees it on its next step
+    await asyncio.sleep(0.01)
+    assert stub.cancelled == ["primary"]
+    route_stats = hedge.stats["hedge-slow"]
+    assert (route_stats.hedges, route_stats.backup_wins) == (1, 1)
+    assert route_stats.wasted_tokens == len(PROMPT) // 4
+    assert metrics._totals[wasted] - before == len(PROMPT) // 4
+
+
+async def test_hedge_delay_follows_observed_latencies(llm, monkeypatch):
+    monkeypatch.setattr(hedge, "HEDGE_MIN_DELAY", 0.01)
+    slow = route("hedge-adaptive", budget=5)
+    assert hedge.hedge_delay(slow) == 5
+    route_stats = hedge.stats.setdefault("hedge-adaptive", hedge.HedgeStats())
+    route_stats.latencies.extend([0.05] * hedge.HEDGE_MIN_SAMPLES)
+    assert hedge.hedge_delay(slow) == 0.05
+
+    stub = llm({"primary": 10, "backup": 0.01})
+    start = time.perf_counter()
+    assert await invoke(slow) == "backup"
+    # hedged at the observed latency, long before the budget
+    assert 0.05 <= stub.started["backup"] - stub.started["primary"] < 1
+    assert time.perf_counter() - start < 1
+
+
+async def test_failed_first_call_falls_back_at_once(llm):
+    stub = llm({"primary": 0.01, "backup": 0.01}, failing=("primary",))
+    assert await invoke(route("hedge-failed", budget=5)) == "backup"
+    assert stub.started["backup"] - stub.started["primary"] < 1
+    route_stats = hedge.stats["hedge-failed"]
+    assert (route_stats.hedges, route_stats.failed_attempts) == (0, 1)
+
+
+async def test_every_call_failing_raises(llm):
+    llm({"primary": 0.01, "backup": 0.01}, failing=("primary", "backup"))
+    with pytest.raises(RuntimeError):
+        await invoke(route("hedge-down", budget=5))
+    assert hedge.stats["hedge-down"].failures == 1
@@ -0,0 +1,21 @@
+import pytest
+from pydantic import ValidationError
+
+from backend.suggest.identify import IdentifyTableArgs
+
+
+def table_args(indexes: list) -> dict:
+    return {
+        "prefixed_id": "br-table-1",
+        "has_header": True,
+        "columns": [
+            {"column_index": index, "column_name": f"column {index}", "sample_values": ["1"]}
+            for index in indexes
+        ],
+    }
+
+
+def test_column_indexes_are_unique():
+    assert len(IdentifyTableArgs.model_validate(table_args([0, 1, 2])).columns) == 3
+    with pytest.raises(ValidationError, match=r"Duplicate column_index values: \[1\]"):
+        IdentifyTableArgs.model_validate(table_args([0, 1, 1, 2]))
@@ -0,0 +1,36 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from backend.suggest import identify_cache
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(identify_cache, "get_redis", lambda: fake)
+    return fake
+
+
+async def test_hits_and_misses_are_counted(redis):
+    key = identify_cache.cache_key("Country", ["France", "Peru"], "v1")
+    assert await identify_cache.get(key) is None
+    await identify_cache.put(key, '{"type": "text"}')
+    assert await identify_cache.get(key) == '{"type": "text"}'
+    assert await identify_cache.get(key) == '{"type": "text"}'
+
+    # the counts are written in the background
+    await asyncio.gather(*identify_cache._stats_updates)
+    assert await identify_cache.get_stats() == {"hits": 2, "misses": 1}
+
+
+async def test_failed_count_does_not_fail_the_lookup(redis, monkeypatch):
+    async def hincrby(*args):
+        raise ConnectionError("Redis went away")
+
+    monkeypatch.setattr(redis, "hincrby", hincrby)
+    assert await identify_cache.get("br-identify-missing") is None
+    # the error is logged once the count finishes
+    await asyncio.sleep(0.01)
+    assert not identify_cache._stats_updates
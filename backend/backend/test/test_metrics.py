@@ -0,0 +1,70 @@
+import fakeredis
+import pytest
+
+from backend import metrics, redis_client
+
+gauge = metrics.Gauge("test_gauge", "A gauge for the tests")
+counter = metrics.Counter("test_counter", "A counter for the tests")
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(redis_client, "get_redis", lambda: fake)
+    monkeypatch.setattr(metrics, "_pending", {})
+    monkeypatch.setattr(metrics, "_gauges", {})
+    return fake
+
+
+def value(text: str, series: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.split()[-1])
+    raise KeyError(series)
+
+
+async def flush_as(monkeypatch, worker_id: str) -> None:
+    monkeypatch.setattr(metrics, "WORKER_ID", worker_id)
+    await metrics.flush()
+
+
+async def test_gauges_are_summed_over_live_workers(redis, monkeypatch):
+    gauge.add(2, route="a")
+    await flush_as(monkeypatch, "worker-1")
+    metrics._gauges.clear()
+    gauge.add(3, route="a")
+    await flush_as(monkeypatch, "worker-2")
+    assert value(await metrics.render(), 'test_gauge{route="a"}') == 5
+
+    # worker-1 stops flushing, e.g. it crashed holding its 2
+    await redis.zadd(metrics.WORKERS_KEY, {"worker-1": 0})
+    assert value(await metrics.render(), 'test_gauge{route="a"}') == 3
+
+
+async def test_gauges_are_set_not_added(redis, monkeypatch):
+    gauge.add(1)
+    await flush_as(monkeypatch, "worker-1")
+    gauge.add(-1)
+    await flush_as(monkeypatch, "worker-1")
+    await flush_as(monkeypatch, "worker-1")
+    assert value(await metrics.render(), "test_gauge") == 0
+    assert await redis.ttl(metrics._gauges_key("worker-1")) > 0
+
+
+async def test_stopped_worker_gauges_are_dropped(redis, monkeypatch):
+    monkeypatch.setattr(metrics, "WORKER_ID", "worker-1")
+    gauge.add(4)
+    await metrics.stop()
+    # scraped from another worker
+    metrics._gauges.clear()
+    monkeypatch.setattr(metrics, "WORKER_ID", "worker-2")
+    with pytest.raises(KeyError):
+        value(await metrics.render(), "test_gauge")
+
+
+async def test_counters_are_added_up(redis, monkeypatch):
+    counter.inc(2)
+    await flush_as(monkeypatch, "worker-1")
+    counter.inc(3)
+    await flush_as(monkeypatch, "worker-2")
+    assert value(await metrics.render(), "test_counter") == 5
@@ -0,0 +1,69 @@
+import pytest
+
+from backend.suggest.numeric_profile import profile_values
+
+
+def test_too_few_numbers():
+    assert profile_values(["1", "x", ""]) is None
+
+
+@pytest.mark.parametrize(
+    "values", [["1", "2", "1e400", "5"], ["1", "-1e400", "2", "5"], ["1", "2", "nan", "5"]]
+)
+def test_non_finite_values_are_not_numbers(values):
+    profile = profile_values(values)
+    assert profile is not None
+    assert (profile.count, profile.non_numeric) == (3, 1)
+    assert (profile.min, profile.max) == (1, 5)
+
+
+def test_range_overflow():
+    profile = profile_values(["-1e308", "0", "1e308"])
+    assert profile is not None
+    assert (profile.suggested_min, profile.suggested_max) == (-1e308, 1e308)
+
+
+def test_range_and_quantiles():
+    profile = profile_values([str(x) for x in range(1, 101)] + ["n/a"])
+    assert profile is not None
+    assert profile.count == 100
+    assert profile.non_numeric == 1
+    assert (profile.min, profile.max) == (1, 100)
+    assert profile.quantiles[0.5] == 51
+
+
+@pytest.mark.parametrize(
+    "values, bounds",
+    [
+        # zero is close to the data
+        (["3.2", "100", "873.2"], (0, 880)),
+        # but not to years
+        (["1990", "2005", "2020"], (1990, 2020)),
+        (["1,200", "1,350", "1,480"], (1200, 1480)),
+        (["-873.2", "-10", "-3"], (-880, 0)),
+        (["-12.5", "0", "40.2"], (-13, 41)),
+        (["0.0012", "0.002", "0.0031"], (0.0011, 0.0031)),
+    ],
+)
+def test_suggested_bounds(values, bounds):
+    profile = profile_values(values)
+    assert profile is not None
+    assert (profile.suggested_min, profile.suggested_max) == bounds
+
+
+def test_integer_bounds_are_whole_numbers():
+    profile = profile_values(["0.2", "0.5", "0.9"], kind="integer")
+    assert profile is not None
+    assert (profile.suggested_min, profile.suggested_max) == (0, 1)
+
+
+def test_log_scale():
+    skewed = [str(10**exponent) for exponent in range(7) for _ in range(7 - exponent)]
+    profile = profile_values(skewed)
+    assert profile is not None
+    assert profile.log_scale
+    assert profile.decades == 6
+
+    uniform = profile_values([str(x) for x in range(1, 1001)])
+    assert uniform is not None
+    assert not uniform.log_scale
@@ -0,0 +1,74 @@
+import json
+import random
+
+import pytest
+
+from backend.suggest.partial_json import TopLevelFieldParser
+
+DOCUMENTS = [
+    '{"name": "Sales by region", "description": "Bars", "engine": "vega-lite"}',
+    '{"a": "say \\"hi\\"", "b": "back\\\\slash\\\\", "c": "\\u00e9t\\u00e9 \\n"}',
+    '{"braces": "} { ] [ , :", "key, with: marks": 1}',
+    '{"spec": {"mark": {"type": "bar"}, "layer": [{"encoding": {"x": [1, {"y": []}]}}]}, "n": 2}',
+    '{"number": -1.5e3, "flag": true, "nothing": null, "list": [1, "2", [3]]}',
+    '{ "spaced" :  "out" ,\n  "lines" : [ 1 ,\n 2 ]\n}',
+    "{}",
+]
+
+
+def parse_in_chunks(document: str, splits: list) -> list:
+    parser = TopLevelFieldParser()
+    fields = []
+    previous = 0
+    for split in splits + [len(document)]:
+        fields += parser.feed(document[previous:split])
+        previous = split
+    return fields
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_every_split_matches_json_loads(document):
+    expected = list(json.loads(document).items())
+    for split in range(len(document) + 1):
+        assert parse_in_chunks(document, [split]) == expected, split
+    # one character at a time
+    assert parse_in_chunks(document, list(range(1, len(document)))) == expected
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_random_splits_match_json_loads(document):
+    expected = list(json.loads(document).items())
+    rng = random.Random(document)
+    for _ in range(200):
+        splits = sorted(rng.sample(range(len(document) + 1), min(len(document), 5)))
+        assert parse_in_chunks(document, splits) == expected, splits
+
+
+def test_raw_newlines_in_strings():
+    # models put unescaped newlines in code, e.g. observablePlotCode
+    document = '{"code": "Plot.plot({\n  marks: []\n})", "engine": "observable-plot"}'
+    assert parse_in_chunks(document, [20]) == [
+        ("code", "Plot.plot({\n  marks: []\n})"),
+        ("engine", "observable-plot"),
+    ]
+
+
+def test_fields_are_returned_as_soon_as_complete():
+    parser = TopLevelFieldParser()
+    assert parser.feed('{"name": "Sales", "spec": {"mark": "ba') == [("name", "Sales")]
+    assert parser.feed('r"}') == []
+    assert parser.feed("}") == [("spec", {"mark": "bar"})]
+    assert parser.done
+
+
+def test_text_around_the_object_is_ignored():
+    parser = TopLevelFieldParser()
+    fields = parser.feed('Here it is:\n```json\n{"a": 1, "b": {"c": "}"}}')
+    fields += parser.feed('\n```\n{"ignored": true}')
+    assert fields == [("a", 1), ("b", {"c": "}"})]
+
+
+def test_invalid_values_are_skipped():
+    # left to the repair of the whole response
+    parser = TopLevelFieldParser()
+    assert parser.feed('{\'a\': 1, "b": [1, 2,], "c": 3}') == [("c", 3)]
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from backend.suggest import rank
+from backend.suggest.catalog import CatalogType
+
+
+def make_type(id: str, name: str, updated_at: datetime = datetime(2025, 1, 1)) -> CatalogType:
+    return CatalogType(
+        id=id,
+        kind="enum",
+        name=name,
+        description="",
+        rules=(),
+        examples=(),
+        min_value=None,
+        max_value=None,
+        log_scale=False,
+        values_key=None,
+        updated_at=updated_at,
+    )
+
+
+def test_select_candidates_most_similar_first(monkeypatch):
+    monkeypatch.setattr(rank, "index", rank.CustomTypeIndex())
+    types = [make_type(str(i), name) for i, name in enumerate(["country", "pdb-id", "gene"])]
+    candidates = rank.select_candidates("pdb_id", ["6TT7", "1ABC"], types, k=2)
+    assert candidates[0].name == "pdb-id"
+    assert len(candidates) == 2
+
+
+def test_users_do_not_evict_each_other(monkeypatch):
+    embedded = []
+    embed_custom_type = rank._embed_custom_type
+
+    def counting_embed(type_: CatalogType) -> rank.Vector:
+        embedded.append(type_.id)
+        return embed_custom_type(type_)
+
+    monkeypatch.setattr(rank, "_embed_custom_type", counting_embed)
+    index = rank.CustomTypeIndex()
+    public = [make_type("public", "country")]
+    alice, bob = public + [make_type("alice", "gene")], public + [make_type("bob", "strain")]
+    for catalog in (alice, bob, alice, bob):
+        index.vectors(catalog)
+    assert embedded == ["public", "alice", "bob"]
+
+    # only a changed type is embedded again
+    index.vectors(public + [make_type("alice", "gene", datetime(2025, 2, 1))])
+    assert embedded == ["public", "alice", "bob", "alice"]
+
+
+def test_least_recently_used_types_are_dropped():
+    index = rank.CustomTypeIndex(size=2)
+    index.vectors([make_type("a", "a"), make_type("b", "b")])
+    index.vectors([make_type("c", "c"), make_type("a", "a")])
+    assert len(index) == 2
+    assert set(index._entries) == {"c", "a"}
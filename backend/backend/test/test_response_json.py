@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from backend.suggest import response_json
+from backend.suggest.response_json import ResponseError, extract_object, loads, repair
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+        ("{'a': 'it\\'s', 'b': 'say \"hi\"'}", {"a": "it's", "b": 'say "hi"'}),
+        ('{"code": "line 1\nline 2\tend"}', {"code": "line 1\nline 2\tend"}),
+        ('{"regex": "\\d+"}', {"regex": "\\d+"}),
+        ('{"text": "a, }"}', {"text": "a, }"}),
+    ],
+)
+def test_repair(text, expected):
+    assert json.loads(repair(text)) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        'Here you go:\n```json\n{"a": 1}\n```\nAnything else?',
+        '```\n{"a": 1}\n```',
+        'Sure! {"a": 1} Hope that helps.',
+    ],
+)
+def test_extract_object(text):
+    assert json.loads(extract_object(text)) == {"a": 1}
+
+
+def test_extract_object_skips_braces_in_strings():
+    assert extract_object('x {"a": "}{", "b": [{}]} y') == '{"a": "}{", "b": [{}]}'
+
+
+def test_extract_object_without_object():
+    with pytest.raises(ResponseError):
+        extract_object("no JSON here")
+
+
+def test_loads_counts_repairs():
+    response_json.stats.clear()
+    assert loads('{"a": 1}', "test") == {"a": 1}
+    assert loads("```json\n{'a': 1,}\n```", "test") == {"a": 1}
+    stats = response_json.stats["test"]
+    assert (stats.responses, stats.repaired) == (2, 1)
+
+
+@pytest.mark.parametrize("text", ['{"a": 1', "[1, 2]", "not JSON"])
+def test_loads_rejects(text):
+    with pytest.raises(ResponseError):
+        loads(text)
@@ -0,0 +1,141 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from backend.suggest import single_flight
+
+FLIGHT_KEY = single_flight.key("test", prompt="p")
+LOCK_KEY = f"{single_flight.KEY_PREFIX}lock-{FLIGHT_KEY}"
+RESULT_KEY = f"{single_flight.KEY_PREFIX}result-{FLIGHT_KEY}"
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(single_flight, "get_redis", lambda: fake)
+    monkeypatch.setattr(single_flight, "POLL_INTERVAL", 0.01)
+    return fake
+
+
+def counting(result: str, calls: list, release: asyncio.Event, error: bool = False):
+    async def work() -> str:
+        calls.append(result)
+        await release.wait()
+        if error:
+            raise RuntimeError("LLM call failed")
+        return result
+
+    return work
+
+
+async def wait_until(condition) -> None:
+    for _ in range(100):
+        if await condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+async def test_concurrent_callers_in_one_worker_share_a_call(redis):
+    calls: list = []
+    release = asyncio.Event()
+    work = counting("result", calls, release)
+    callers = [asyncio.create_task(single_flight.run(FLIGHT_KEY, "test", work)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    release.set()
+    assert await asyncio.gather(*callers) == ["result", "result"]
+    assert calls == ["result"]
+    assert not await redis.exists(LOCK_KEY)
+
+
+async def test_concurrent_callers_in_two_workers_share_a_call(redis):
+    calls: list = []
+    release = asyncio.Event()
+    # _lead is what each worker's flight runs
+    leader = asyncio.create_task(
+        single_flight._lead(FLIGHT_KEY, "test", counting("leader", calls, release))
+    )
+
+    async def locked() -> bool:
+        return bool(await redis.exists(LOCK_KEY))
+
+    await wait_until(locked)
+    follower = asyncio.create_task(
+        single_flight._lead(FLIGHT_KEY, "test", counting("follower", calls, release))
+    )
+    await asyncio.sleep(0.05)
+    release.set()
+    assert await asyncio.wait_for(asyncio.gather(leader, follower), 1) == ["leader", "leader"]
+    assert calls == ["leader"]
+
+
+async def test_expired_lock_is_not_released_by_its_old_owner(redis):
+    calls: list = []
+    first_release, second_release = asyncio.Event(), asyncio.Event()
+    first = asyncio.create_task(
+        single_flight._lead(FLIGHT_KEY, "test", counting("first", calls, first_release))
+    )
+
+    async def locked() -> bool:
+        return bool(await redis.exists(LOCK_KEY))
+
+    await wait_until(locked)
+    # the first owner's lock expires while its call is still running
+    await redis.delete(LOCK_KEY)
+    second = asyncio.create_task(
+        single_flight._lead(FLIGHT_KEY, "test", counting("second", calls, second_release))
+    )
+    await wait_until(locked)
+    second_token = await redis.get(LOCK_KEY)
+
+    first_release.set()
+    assert await first == "first"
+    # the compare-and-delete left the second owner's lock alone
+    assert await redis.get(LOCK_KEY) == second_token
+
+    second_release.set()
+    assert await second == "second"
+    assert calls == ["first", "second"]
+    assert not await redis.exists(LOCK_KEY)
+
+
+async def test_failed_owner_lets_waiters_go_without_a_stale_result(redis):
+    # left by an earlier flight with the same key
+    await redis.set(RESULT_KEY, "stale")
+    calls: list = []
+    owner_release, waiter_release = asyncio.Event(), asyncio.Event()
+    owner = asyncio.create_task(
+        single_flight._lead(FLIGHT_KEY, "test", counting("owner", calls, owner_release, True))
+    )
+
+    async def locked() -> bool:
+        return bool(await redis.exists(LOCK_KEY))
+
+    await wait_until(locked)
+    waiter = asyncio.create_task(
+        single_flight._lead(FLIGHT_KEY, "test", counting("fresh", calls, waiter_release))
+    )
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+
+    owner_release.set()
+    with pytest.raises(RuntimeError):
+        await owner
+    # the waiter runs the call itself rather than hang or take "stale"
+    waiter_release.set()
+    assert await asyncio.wait_for(waiter, 1) == "fresh"
+    assert calls == ["owner", "fresh"]
+
+
+async def test_failed_owner_fails_its_workers_waiters(redis):
+    calls: list = []
+    release = asyncio.Event()
+    work = counting("result", calls, release, error=True)
+    callers = [asyncio.create_task(single_flight.run(FLIGHT_KEY, "test", work)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == ["result"]
+    assert single_flight._flights == {}
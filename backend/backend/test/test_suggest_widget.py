@@ -0,0 +1,180 @@
+import copy
+
+import pytest
+
+from backend.routers.suggest_widget import (
+    SuggestWidgetArgs,
+    WidgetSuggestion,
+    guard_spec,
+    suggestion_signature,
+)
+
+# the first 10 rows, as the frontend sends them
+COUNTRIES = ["France", "Peru", "Chile", "Japan", "Kenya", "Spain", "Italy", "Chad", "Fiji", "Laos"]
+NUMBERS = ["3.2", "14", "0.5", "27", "8.1", "19", "2.2", "40", "11", "6.7"]
+
+
+def vega_lite(spec: dict, name: str = "chart") -> WidgetSuggestion:
+    return WidgetSuggestion(name=name, description="", engine="vega-lite", vegaLiteSpec=spec)
+
+
+def test_swapped_channels_and_aggregate_aliases_are_duplicates():
+    a = vega_lite(
+        {
+            "mark": "bar",
+            "encoding": {
+                "x": {"field": "country", "type": "nominal"},
+                "y": {"field": "gdp", "aggregate": "mean", "type": "quantitative"},
+                "tooltip": [{"field": "population"}],
+            },
+        }
+    )
+    b = vega_lite(
+        {
+            "mark": {"type": "Bar"},
+            "encoding": {
+                "y": {"field": "country", "type": "nominal"},
+                "x": {"field": "gdp", "aggregate": "average", "type": "quantitative"},
+            },
+        }
+    )
+    assert suggestion_signature(a, []) == suggestion_signature(b, [])
+
+
+def test_different_aggregates_and_layers_differ():
+    base = {"x": {"field": "year", "timeUnit": "year"}, "y": {"field": "gdp", "aggregate": "sum"}}
+    line = vega_lite({"mark": "line", "encoding": base})
+    binned = vega_lite({"mark": "line", "encoding": {**base, "x": {"field": "year", "bin": True}}})
+    layered = vega_lite(
+        {"layer": [{"mark": "line", "encoding": base}, {"mark": "point", "encoding": base}]}
+    )
+    argmax = vega_lite(
+        {"mark": "line", "encoding": {**base, "y": {"field": "gdp", "aggregate": {"argmax": "y"}}}}
+    )
+    signatures = [suggestion_signature(s, []) for s in (line, binned, layered, argmax)]
+    assert len(set(signatures)) == 4
+
+
+def test_observable_plot_signature():
+    code = 'Plot.plot({marks: [Plot.barY(data, {x: "country", y: "gdp"})]})'
+    suggestion = WidgetSuggestion(
+        name="chart", description="", engine="observable-plot", observablePlotCode=code
+    )
+    assert suggestion_signature(suggestion, ["country", "gdp", "year"]) == (
+        frozenset({"barY"}),
+        frozenset({("country", None), ("gdp", None)}),
+    )
+
+
+def guard_args(data_size: int, columns: dict) -> SuggestWidgetArgs:
+    return SuggestWidgetArgs.model_validate(
+        {
+            "engine": "vega-lite",
+            "existingWidgets": [],
+            "dataSize": data_size,
+            "columns": [
+                {
+                    "fieldName": name,
+                    "identification": {"type": type_, "description": ""},
+                    "sampleValues": values,
+                }
+                for name, (type_, values) in columns.items()
+            ],
+        }
+    )
+
+
+COLUMNS = {
+    "country": ("text", COUNTRIES),
+    "gdp": ("decimal-numbers", NUMBERS),
+    "growth": ("decimal-numbers", NUMBERS[::-1]),
+    "region": ("text", ["north", "south", "east", "west", "north"] * 2),
+}
+
+BAR = {
+    "mark": "bar",
+    "encoding": {
+        "x": {"field": "country", "type": "nominal"},
+        "y": {"field": "gdp", "type": "quantitative"},
+    },
+}
+
+SCATTER = {
+    "mark": "point",
+    "encoding": {
+        "x": {"field": "gdp", "type": "quantitative"},
+        "y": {"field": "growth", "type": "quantitative"},
+        "color": {"field": "country", "type": "nominal"},
+    },
+}
+
+LINE = {
+    "mark": "line",
+    "encoding": {
+        "x": {"field": "gdp", "type": "quantitative"},
+        "y": {"field": "growth", "type": "quantitative"},
+        "color": {"field": "region", "type": "nominal"},
+    },
+}
+
+
+@pytest.mark.parametrize("spec", [BAR, SCATTER, LINE])
+@pytest.mark.parametrize("data_size", [10, 300])
+def test_small_data_is_not_rewritten(spec, data_size):
+    guarded = copy.deepcopy(spec)
+    assert guard_spec(guarded, guard_args(data_size, COLUMNS)) == []
+    assert guarded == spec
+
+
+def test_line_is_not_sampled():
+    line = copy.deepcopy(LINE)
+    assert guard_spec(line, guard_args(100_000, COLUMNS)) == []
+
+
+def test_large_bar_is_aggregated_then_filtered():
+    bar = copy.deepcopy(BAR)
+    assert guard_spec(bar, guard_args(100_000, COLUMNS)) == ["aggregate", "filter"]
+    assert bar["encoding"]["y"]["aggregate"] == "sum"
+    assert bar["transform"][-1] == {"filter": "datum.__rank_0 <= 400"}
+
+
+def test_large_scatter_is_sampled_and_keeps_its_legend():
+    scatter = copy.deepcopy(SCATTER)
+    scatter["encoding"]["color"]["field"] = "region"
+    assert guard_spec(scatter, guard_args(100_000, COLUMNS)) == ["sample"]
+    assert scatter["transform"] == [{"sample": 400}]
+    assert "legend" not in scatter["encoding"]["color"]
+
+
+def test_oversized_labels_and_legend():
+    columns = {**COLUMNS, "city": ("text", [f"city {i}" for i in range(60)] * 2)}
+    bar = copy.deepcopy(BAR)
+    bar["encoding"]["x"]["field"] = "city"
+    assert guard_spec(bar, guard_args(300, columns)) == ["filter"]
+    assert bar["transform"][-1] == {"filter": "datum.__rank_0 <= 40"}
+
+    scatter = copy.deepcopy(SCATTER)
+    scatter["encoding"]["color"]["field"] = "city"
+    assert guard_spec(scatter, guard_args(300, columns)) == ["legend"]
+    assert scatter["encoding"]["color"]["legend"] is None
+    assert scatter["encoding"]["tooltip"] == {"field": "city", "type": "nominal"}
+
+
+def test_lone_quantitative_bar_becomes_a_histogram():
+    bar = {"mark": "bar", "encoding": {"x": {"field": "gdp", "type": "quantitative"}}}
+    assert guard_spec(bar, guard_args(100_000, COLUMNS)) == ["bin"]
+    assert bar["encoding"] == {
+        "x": {"field": "gdp", "type": "quantitative", "bin": True},
+        "y": {"aggregate": "count", "type": "quantitative"},
+    }
+
+
+def test_fields_are_matched_to_columns():
+    bar = copy.deepcopy(BAR)
+    bar["encoding"]["x"]["field"] = "Country"
+    guard_spec(bar, guard_args(10, COLUMNS))
+    assert bar["encoding"]["x"]["field"] == "country"
+
+    bar["encoding"]["y"]["field"] = "population"
+    with pytest.raises(ValueError, match="population"):
+        guard_spec(bar, guard_args(10, COLUMNS))
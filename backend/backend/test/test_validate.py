@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from backend import validate
+from backend.suggest.catalog import CatalogType
+from backend.validate import validate_values
+
+
+def make_type(kind: str, **kwargs) -> CatalogType:
+    return CatalogType(
+        **{
+            "id": "1",
+            "kind": kind,
+            "name": f"test-{kind}",
+            "description": "",
+            "rules": (),
+            "examples": (),
+            "min_value": None,
+            "max_value": None,
+            "log_scale": False,
+            "values_key": None,
+            "updated_at": datetime(2025, 1, 1),
+            **kwargs,
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "custom_type, values, invalid",
+    [
+        (make_type("integer"), ["1", " 2 ", "1,000", "1.5", "x"], [3, 4]),
+        (make_type("integer", min_value=0.0, max_value=10.0), ["0", "10", "11", "-1"], [2, 3]),
+        (make_type("decimal"), ["1.5", "-2e3", ".5", "1,234.5", "1.2.3"], [4]),
+        (make_type("decimal", min_value=0.0, log_scale=True), ["0", "0.1", "-1"], [0, 2]),
+        (make_type("date"), ["2024-02-29", "2024/12/31", "1/2/24", "2024-13-01"], [3]),
+        (make_type("time"), ["12:30", "23:59:59.5", "7:05 pm", "24:00"], [3]),
+    ],
+)
+async def test_validate_values(custom_type, values, invalid):
+    assert await validate_values(values, custom_type) == invalid
+
+
+async def test_missing_values_are_not_reported():
+    values = ["", "NA", "n/a", "null", "1"]
+    assert await validate_values(values, make_type("integer")) == []
+
+
+async def test_repeated_invalid_values_are_all_reported():
+    values = ["x", "1", "x", "2", "x"]
+    assert await validate_values(values, make_type("integer")) == [0, 2, 4]
+
+
+async def test_enum_values_are_checked_once(monkeypatch):
+    checked = []
+
+    async def enum_verdicts(values_key, values):
+        checked.extend(values)
+        return [value in {"a", "b"} for value in values]
+
+    monkeypatch.setattr(validate, "_enum_verdicts", enum_verdicts)
+    values = ["a", "c", "b", "c", "", "a"]
+    custom_type = make_type("enum", values_key="br-values-1")
+    assert await validate_values(values, custom_type) == [1, 3]
+    assert checked == ["a", "c", "b"]
+
+
+async def test_enum_without_values_key_fails():
+    with pytest.raises(ValueError):
+        await validate_values(["a"], make_type("enum"))
@@ -0,0 +1,168 @@
+"""
+Validate whole columns against custom types
+"""
+
+import asyncio
+import re
+from functools import lru_cache
+from itertools import compress, count
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from backend.redis_client import get_redis
+from backend.suggest import catalog
+from backend.suggest.catalog import CatalogType
+from backend.suggest.classify import MISSING_VALUES
+
+# members checked per SMISMEMBER, to keep Redis replies small
+ENUM_BATCH_SIZE = 10_000
+
+INTEGER_PATTERN = re.compile(r"[+-]?(\d+|\d{1,3}(,\d{3})+)")
+DECIMAL_PATTERN = re.compile(r"[+-]?((\d+|\d{1,3}(,\d{3})+)(\.\d*)?|\.\d+)([eE][+-]?\d+)?")
+DATE_PATTERN = re.compile(
+    r"\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])"
+    r"|\d{4}/(0[1-9]|1[0-2])/(0[1-9]|[12]\d|3[01])"
+    r"|\d{1,2}/\d{1,2}/(\d{2}|\d{4})"
+    r"|\d{1,2}\.\d{1,2}\.\d{4}"
+)
+TIME_PATTERN = re.compile(r"([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d+)?)?(\s?[AaPp][Mm])?")
+
+
+class ValidateColumnArgs(SQLModel):
+    type_id: str
+    values: List[str]
+
+
+class ValidateColumnResult(SQLModel):
+    invalid_indices: List[int]
+    invalid_count: int
+    total: int
+
+
+def _is_missing(value: str) -> bool:
+    return value.strip().lower() in MISSING_VALUES
+
+
+Validator = Callable[[List[str]], List[bool]]
+
+
+def _number_validator(
+    pattern: re.Pattern,
+    min_value: Optional[float],
+    max_value: Optional[float],
+    log_scale: bool,
+) -> Validator:
+    lower = min_value if min_value is not None else float("-inf")
+    if log_scale:
+        lower = max(lower, 0.0)
+    upper = max_value if max_value is not None else float("inf")
+    nan = float("nan")
+
+    def validate(values: List[str]) -> List[bool]:
+        # map and comprehensions instead of a per-value function call; nan
+        # fails both comparisons
+        matches = map(pattern.fullmatch, map(str.strip, values))
+        numbers = [float(m.group().replace(",", "")) if m else nan for m in matches]
+        if log_scale:
+            return [lower < number <= upper for number in numbers]
+        return [lower <= number <= upper for number in numbers]
+
+    return validate
+
+
+def _pattern_validator(pattern: re.Pattern) -> Validator:
+    return lambda values: [m is not None for m in map(pattern.fullmatch, map(str.strip, values))]
+
+
+@lru_cache(maxsize=1024)
+def compile_validator(custom_type: CatalogType) -> Validator:
+    """Build the batch check for a non-enum custom type. Cached per type
+    version, since CatalogType includes updated_at."""
+    if custom_type.kind == "integer":
+        return _number_validator(
+            INTEGER_PATTERN, custom_type.min_value, custom_type.max_value, custom_type.log_scale
+        )
+    if custom_type.kind == "decimal":
+        return _number_validator(
+            DECIMAL_PATTERN, custom_type.min_value, custom_type.max_value, custom_type.log_scale
+        )
+    if custom_type.kind == "date":
+        return _pattern_validator(DATE_PATTERN)
+    if custom_type.kind == "time":
+        return _pattern_validator(TIME_PATTERN)
+    raise ValueError(f"Cannot compile a validator for kind {custom_type.kind}")
+
+
+async def _enum_verdicts(values_key: str, values: List[str]) -> List[bool]:
+    verdicts: List[bool] = []
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for start in range(0, len(values), ENUM_BATCH_SIZE):
+            pipe.smismember(values_key, values[start : start + ENUM_BATCH_SIZE])
+        for batch in await pipe.execute():
+            verdicts.extend(map(bool, batch))
+    return verdicts
+
+
+def _unique_values(values: List[str]) -> List[str]:
+    return [value for value in dict.fromkeys(values) if not _is_missing(value)]
+
+
+def _invalid_indices(
+    values: List[str], unique_values: List[str], verdicts: List[bool]
+) -> List[int]:
+    invalid = {value for value, is_valid in zip(unique_values, verdicts) if not is_valid}
+    return list(compress(count(), map(invalid.__contains__, values)))
+
+
+def _validate_locally(values: List[str], validate: Validator) -> List[int]:
+    unique_values = _unique_values(values)
+    return _invalid_indices(values, unique_values, validate(unique_values))
+
+
+async def validate_values(values: List[str], custom_type: CatalogType) -> List[int]:
+    """Indices of the values that are not valid for the custom type. Missing
+    values (empty, "NA", ...) are not reported.
+
+    Each distinct value is checked once, so columns with repeated values cost
+    little more than their distinct values. The per-value work runs in a
+    thread, so a million-row column does not block the event loop.
+    """
+    if custom_type.kind != "enum":
+        return await asyncio.to_thread(_validate_locally, values, compile_validator(custom_type))
+    if not custom_type.values_key:
+        raise ValueError(f"Enum type {custom_type.name} has no values")
+    unique_values = await asyncio.to_thread(_unique_values, values)
+    verdicts = await _enum_verdicts(custom_type.values_key, unique_values)
+    return await asyncio.to_thread(_invalid_indices, values, unique_values, verdicts)
+
+
+async def validate_column(
+    args: ValidateColumnArgs,
+    session: AsyncSession,
+    user_id: str,
+) -> ValidateColumnResult:
+    """
+    Validate every value of a column against one of the user's or a public
+    custom type.
+    """
+    custom_type_catalog = await catalog.load_catalog(session, user_id)
+    custom_type = next(
+        (type_ for type_ in custom_type_catalog.types if type_.id == args.type_id), None
+    )
+    if custom_type is None:
+        raise HTTPException(status_code=404, detail="Custom type not found")
+
+    try:
+        invalid_indices = await validate_values(args.values, custom_type)
+    except Exception as error:
+        print("❌ Error validating column:", error)
+        raise HTTPException(status_code=500, detail="Failed to validate column")
+
+    return ValidateColumnResult(
+        invalid_indices=invalid_indices,
+        invalid_count=len(invalid_indices),
+        total=len(args.values),
+    )
@@ -0,0 +1,107 @@
+"""Interactive latency while other users identify wide tables, with and without
+admission control.
+
+Six users each identify a 200 column table, 8 columns at a time like
+identify_table, while a seventh makes single-column requests one after the
+other. Every LLM call sleeps 0.25-0.75s. "no admission control" is one FIFO
+semaphore with the same number of slots. Then one user sends a burst of
+requests, which the bounded queue turns away with a 429 instead of queueing.
+
+    uv run python -m scripts.bench.admission
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from backend.admission import BULK, INTERACTIVE, AdmissionController, AdmissionRejected
+
+# IDENTIFY_TABLE_CONCURRENCY's default
+TABLE_CONCURRENCY = 8
+TABLE_COLUMNS = 200
+TABLE_USERS = 6
+INTERACTIVE_REQUESTS = 20
+
+_random = random.Random(1)
+
+
+async def llm_call() -> None:
+    await asyncio.sleep(_random.uniform(0.25, 0.75))
+
+
+class Fifo:
+    """One semaphore, no per-user limit or priority."""
+
+    def __init__(self, slots: int):
+        self.semaphore = asyncio.Semaphore(slots)
+
+    def slot(self, user_id: str, priority: int, timeout=None):
+        return self.semaphore
+
+
+async def table(controller, user_id: str) -> None:
+    semaphore = asyncio.Semaphore(TABLE_CONCURRENCY)
+
+    async def column() -> None:
+        async with semaphore:
+            async with controller.slot(user_id, BULK):
+                await llm_call()
+
+    await asyncio.gather(*(column() for _ in range(TABLE_COLUMNS)))
+
+
+async def interactive(controller, latencies: List[float]) -> None:
+    await asyncio.sleep(1)  # let the tables fill the slots
+    for _ in range(INTERACTIVE_REQUESTS):
+        start = time.perf_counter()
+        async with controller.slot("interactive-user", INTERACTIVE):
+            await llm_call()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(name: str, controller) -> None:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(table(controller, f"table-user-{i}") for i in range(TABLE_USERS)),
+        interactive(controller, latencies),
+    )
+    latencies.sort()
+    print(
+        f"{name}: interactive p50 {statistics.median(latencies):.2f}s, "
+        f"max {latencies[-1]:.2f}s; tables done in {time.perf_counter() - start:.1f}s"
+    )
+
+
+async def burst() -> None:
+    controller = AdmissionController()
+    outcomes: List[str] = []
+
+    async def one() -> None:
+        start = time.perf_counter()
+        try:
+            async with controller.slot("bursty-user", INTERACTIVE, timeout=10):
+                await llm_call()
+            outcomes.append("ok")
+        except AdmissionRejected as e:
+            outcomes.append(
+                f"429 in {(time.perf_counter() - start) * 1e3:.1f} ms "
+                f"(retry after {e.retry_after}s)"
+            )
+
+    await asyncio.gather(*(one() for _ in range(50)))
+    print(f"burst of 50 from one user: {outcomes.count('ok')} ok, first rejection: ", end="")
+    print(next(o for o in outcomes if o != "ok"))
+
+
+async def main() -> None:
+    controller = AdmissionController()
+    await run("no admission control", Fifo(controller.max_in_flight))
+    await run("admission control   ", controller)
+    await burst()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
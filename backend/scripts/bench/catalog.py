@@ -0,0 +1,122 @@
+"""Custom type catalog load latency with 1k and 10k public types: the old full
+select(CustomType) vs. the catalog cache from the database, Redis and memory.
+
+Inserts public types named bench-catalog-* owned by the given user, and deletes
+them at the end. Run against a local supabase postgres and Redis:
+
+    export $(cat .env.local | xargs)
+    uv run python -m scripts.bench.catalog <user_id>
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy import delete, insert
+from sqlmodel import select
+
+from backend import db
+from backend.models import CustomType
+from backend.redis_client import close_redis, get_redis
+from backend.suggest import catalog
+
+REPEAT = 50
+NAME_PREFIX = "bench-catalog-"
+
+
+async def full_select(user_id: str) -> None:
+    async with db.get_read_session_for_user(user_id) as session:
+        async with session.begin():
+            list(
+                (
+                    await session.execute(
+                        select(CustomType).where(
+                            (CustomType.user_id == user_id)
+                            | (CustomType.public == True)  # noqa: E712
+                        )
+                    )
+                )
+                .scalars()
+                .all()
+            )
+
+
+async def cached(user_id: str) -> None:
+    async with db.get_read_session_for_user(user_id) as session:
+        await catalog.load_catalog(session, user_id)
+
+
+async def from_database(user_id: str) -> None:
+    catalog._local.clear()
+    await get_redis().delete(f"{catalog.REDIS_KEY_PREFIX}public")
+    await cached(user_id)
+
+
+async def from_redis(user_id: str) -> None:
+    catalog._local.clear()
+    await cached(user_id)
+
+
+async def time_ms(load, user_id: str) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        await load(user_id)
+        timings.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(timings)
+
+
+async def delete_bench_types(user_id: str) -> None:
+    async with db.get_session_for_user(user_id) as session:
+        async with session.begin():
+            await session.execute(delete(CustomType).where(CustomType.name.startswith(NAME_PREFIX)))
+
+
+async def main(user_id: str) -> None:
+    await delete_bench_types(user_id)
+    for size in [1_000, 10_000]:
+        async with db.get_session_for_user(user_id) as session:
+            async with session.begin():
+                existing = (
+                    await session.execute(
+                        select(CustomType.id).where(CustomType.name.startswith(NAME_PREFIX))
+                    )
+                ).all()
+                await session.execute(
+                    insert(CustomType),
+                    [
+                        {
+                            "kind": "decimal",
+                            "name": f"{NAME_PREFIX}{i}",
+                            "description": f"Benchmark type {i} with a longer description",
+                            "rules": [f"Rule {j} of type {i}" for j in range(5)],
+                            "examples": [str(j * i) for j in range(10)],
+                            "user_id": user_id,
+                            "public": True,
+                        }
+                        for i in range(len(existing), size)
+                    ],
+                )
+
+        results = [
+            (name, await time_ms(load, user_id))
+            for name, load in [
+                ("full select", full_select),
+                ("cache, database", from_database),
+                ("cache, redis", from_redis),
+                ("cache, memory", cached),
+            ]
+        ]
+        print(
+            f"{size:>6} public types: " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in results)
+        )
+
+    print(catalog.stats)
+    await delete_bench_types(user_id)
+    await close_redis()
+    await db.dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1]))
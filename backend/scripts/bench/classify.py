@@ -0,0 +1,58 @@
+"""Short-circuit rate and cost of the local type classifier on the columns in
+example-data/.
+
+    uv run python -m scripts.bench.classify
+"""
+
+import csv
+import random
+import time
+from pathlib import Path
+
+from backend.suggest import classify
+
+EXAMPLE_DATA = Path(__file__).parents[3] / "example-data"
+SAMPLE_SIZE = 10
+REPEAT = 1000
+
+
+def load_columns() -> list[tuple[str, list[str]]]:
+    columns = []
+    for path in sorted(EXAMPLE_DATA.glob("*.csv")):
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+        if len(rows) < 2:
+            continue
+        header, body = rows[0], rows[1:]
+        for i, name in enumerate(header):
+            values = [row[i] for row in body if i < len(row)]
+            if values:
+                columns.append((f"{path.name}:{name or i}", values))
+    return columns
+
+
+def main() -> None:
+    random.seed(0)
+    corpus = [
+        (name, random.sample(values, min(SAMPLE_SIZE, len(values))))
+        for name, values in load_columns()
+    ]
+
+    for name, sample in corpus:
+        classification = classify.classify_column(name.split(":", 1)[1], sample, [])
+        print(f"{name[:60]:60} {classification.type if classification else '→ LLM'}")
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for _, sample in corpus:
+            classify.classify_values(sample)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"\n{len(corpus)} columns, short-circuit rate {classify.stats.short_circuit_rate:.0%}, "
+        f"{elapsed / (REPEAT * len(corpus)) * 1e6:.1f} µs/column"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Requests/sec for a minimal authenticated query, with an engine per request
+(the old behavior) vs. the shared pooled engine.
+
+Run against a local supabase postgres:
+
+    export $(cat .env.local | xargs)
+    uv run python -m scripts.bench.db_session <user_id>
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend import db
+
+REQUESTS = 500
+CONCURRENCY = 20
+
+
+async def engine_per_request(user_id: str) -> None:
+    engine = create_async_engine(os.environ["POSTGRESQL_CONNECTION_STRING"])
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with maker() as session:
+        await session.execute(text(f"call auth.login_as_user('{user_id}')"))
+        await session.execute(text("select auth.uid()"))
+    await engine.dispose()
+
+
+async def pooled(user_id: str) -> None:
+    async with db.get_session_for_user(user_id) as session:
+        await session.execute(text("select auth.uid()"))
+
+
+async def run(name: str, request, user_id: str) -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one() -> None:
+        async with semaphore:
+            await request(user_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {REQUESTS / elapsed:.1f} req/s ({REQUESTS} requests, {CONCURRENCY} concurrent)")
+
+
+async def main(user_id: str) -> None:
+    await run("engine per request", engine_per_request, user_id)
+    await run("pooled engine", pooled, user_id)
+    await db.dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1]))
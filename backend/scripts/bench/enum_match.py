@@ -0,0 +1,83 @@
+"""Latency of enum custom type matching against many large Redis sets.
+
+Loads synthetic sets into REDIS_CONNECTION_STRING under br-bench-values-*,
+then times match_enum_type. SMISMEMBER cost does not depend on set size, so
+only the first set gets LARGE_SET_SIZE members to keep memory reasonable.
+
+    export $(cat .env.local | xargs)
+    uv run python -m scripts.bench.enum_match
+"""
+
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+from backend.redis_client import close_redis, get_redis
+from backend.suggest.catalog import CatalogType
+from backend.suggest.enum_match import match_enum_type
+
+ENUM_TYPES = 300
+LARGE_SET_SIZE = 1_000_000
+SMALL_SET_SIZE = 10_000
+SAMPLE_SIZE = 20
+REPEAT = 200
+KEY_PREFIX = "br-bench-values-"
+
+
+async def load_set(key: str, size: int) -> None:
+    redis = get_redis()
+    await redis.delete(key)
+    batch = 10_000
+    for start in range(0, size, batch):
+        await redis.sadd(key, *(f"{key}:{i}" for i in range(start, min(start + batch, size))))
+
+
+async def main() -> None:
+    custom_types = []
+    for i in range(ENUM_TYPES):
+        key = f"{KEY_PREFIX}{i}"
+        await load_set(key, LARGE_SET_SIZE if i == 0 else SMALL_SET_SIZE)
+        custom_types.append(
+            CatalogType(
+                id=str(uuid.uuid4()),
+                kind="enum",
+                name=f"enum-{i}",
+                description="",
+                rules=(),
+                examples=(),
+                min_value=None,
+                max_value=None,
+                log_scale=False,
+                values_key=key,
+                updated_at=datetime.now(),
+            )
+        )
+    # the matching type is last, behind every other set
+    random.shuffle(custom_types)
+    target = next(t for t in custom_types if t.values_key == f"{KEY_PREFIX}0")
+    custom_types.remove(target)
+    custom_types.append(target)
+
+    timings = []
+    for _ in range(REPEAT):
+        sample = [f"{KEY_PREFIX}0:{random.randrange(LARGE_SET_SIZE)}" for _ in range(SAMPLE_SIZE)]
+        start = time.perf_counter()
+        match = await match_enum_type(sample, custom_types)
+        timings.append((time.perf_counter() - start) * 1e3)
+        assert match is not None and match[0] is target
+
+    timings.sort()
+    print(
+        f"{ENUM_TYPES} enum types (one with {LARGE_SET_SIZE:,} members), {SAMPLE_SIZE} values: "
+        f"p50 {statistics.median(timings):.2f} ms, p99 {timings[int(0.99 * len(timings))]:.2f} ms"
+    )
+
+    await get_redis().delete(*(f"{KEY_PREFIX}{i}" for i in range(ENUM_TYPES)))
+    await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Tail latency of LLM calls with and without hedging.
+
+Runs scripts.mock_llm in its own process with a heavy-tailed latency, then
+makes the same calls through backend.suggest.hedge with one model per route
+(no hedging) and with a backup request. Reports p50/p95/p99, the hedge rate and
+the extra requests and tokens the hedging cost.
+
+    uv run python -m scripts.bench.hedge
+"""
+
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+PORT = 8766
+LATENCY = "lognormal:0.3,0.8"
+CONCURRENCY = 20
+CALLS = 400
+
+os.environ["MOCK_LLM_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ.setdefault("LLM_PROVIDER", "mock")
+
+from backend.suggest import LLMConfig, LLMRoute, close_llms, hedge  # noqa: E402
+from scripts import mock_llm  # noqa: E402
+
+config = LLMConfig(provider="mock", model_name="gpt-4o-mini", mode="structured")
+PROMPT = "Analyze this column of data:\nColumn Name: count\nSample Values: 1, 2, 3"
+
+
+async def mock_requests(client: httpx.AsyncClient) -> int:
+    """Requests since the last call."""
+    stats = (await client.get(f"http://127.0.0.1:{PORT}/stats")).json()
+    await client.post(f"http://127.0.0.1:{PORT}/stats/reset")
+    return stats["requests"]
+
+
+async def run(name: str, route: LLMRoute) -> None:
+    async with httpx.AsyncClient() as client:
+        await mock_requests(client)
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        latencies = []
+
+        async def one() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await hedge.invoke(route, PROMPT, dict)
+                latencies.append((time.perf_counter() - start) * 1e3)
+
+        await asyncio.gather(*(one() for _ in range(CALLS)))
+        latencies.sort()
+        route_stats = hedge.stats[route.endpoint]
+        print(
+            f"{name}: p50 {statistics.median(latencies):6.0f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:6.0f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99)]:6.0f} ms, "
+            f"hedge rate {route_stats.hedge_rate:.1%}, "
+            f"backup wins {route_stats.backup_wins}, "
+            f"{await mock_requests(client)} requests, "
+            f"{route_stats.wasted_tokens} wasted tokens, "
+            f"final hedge delay {hedge.hedge_delay(route):.2f}s"
+        )
+
+
+async def main() -> None:
+    process = mock_llm.start_process(
+        PORT, MOCK_LLM_LATENCY=LATENCY, MOCK_LLM_TOKENS_PER_SECOND="0", MOCK_LLM_SEED="1"
+    )
+    try:
+        await run("no hedging", LLMRoute(endpoint="single", configs=(config,), budget=30))
+        await run("hedged    ", LLMRoute(endpoint="hedged", configs=(config, config), budget=30))
+    finally:
+        await close_llms()
+        process.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
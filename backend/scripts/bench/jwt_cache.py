@@ -0,0 +1,63 @@
+"""Cold vs. warm cost of auth.verify_access_token, for HS256 tokens and for
+ES256 tokens verified against a local JWKS file.
+
+    uv run python -m scripts.bench.jwt_cache
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+from jwt.algorithms import ECAlgorithm
+
+ITERATIONS = 20_000
+SECRET = "bench-secret-bench-secret-bench-secret"
+PRIVATE_KEY = ec.generate_private_key(ec.SECP256R1())
+
+jwk = json.loads(ECAlgorithm.to_jwk(PRIVATE_KEY.public_key()))
+jwk.update({"kid": "bench-key", "alg": "ES256", "use": "sig"})
+jwks_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+json.dump({"keys": [jwk]}, jwks_file)
+jwks_file.close()
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", SECRET)
+os.environ.setdefault("SUPABASE_JWKS_URL", jwks_file.name)
+
+from backend import auth
+
+
+def make_token(i: int, algorithm: str) -> str:
+    payload = {"sub": f"user-{i}", "aud": "authenticated", "exp": int(time.time()) + 3600}
+    if algorithm == "HS256":
+        return jwt.encode(payload, SECRET, algorithm="HS256")
+    return jwt.encode(payload, PRIVATE_KEY, algorithm="ES256", headers={"kid": "bench-key"})
+
+
+async def time_all(tokens: list[str]) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        await auth.verify_access_token(token)
+    return (time.perf_counter() - start) / len(tokens) * 1e6
+
+
+async def main() -> None:
+    assert auth.key_set is not None
+    await auth.key_set.start()
+    auth.VERIFIED_TOKEN_CACHE_SIZE = 2 * ITERATIONS
+
+    for algorithm in ["HS256", "ES256"]:
+        tokens = [make_token(i, algorithm) for i in range(ITERATIONS)]
+        cold = await time_all(tokens)
+        warm = await time_all(tokens)
+        print(f"{algorithm} cold: {cold:.2f} µs/token, warm (cache hit): {warm:.2f} µs/token")
+
+    await auth.key_set.stop()
+    os.remove(jwks_file.name)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
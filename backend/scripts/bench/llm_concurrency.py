@@ -0,0 +1,104 @@
+"""Concurrent in-flight LLM calls vs. database pool size.
+
+Runs identify_column and suggest_custom_type concurrently with a one
+connection pool and an LLM stand-in that sleeps, then reports how many LLM
+calls were in flight at once. If connections were held across the LLM call,
+this would be capped at the pool size. Every request has its own column, so
+none is answered by the local classifier, the identify cache or another
+request's call.
+
+    export $(cat .env.local | xargs)
+    uv run python -m scripts.bench.llm_concurrency <user_id>
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+from langchain_core.messages import AIMessageChunk
+
+os.environ["POSTGRESQL_POOL_SIZE"] = "1"
+os.environ["POSTGRESQL_POOL_MAX_OVERFLOW"] = "0"
+
+from backend import db  # noqa: E402
+from backend.suggest import custom_type, identify, telemetry  # noqa: E402
+
+REQUESTS = 50
+LLM_LATENCY = 1.0
+
+in_flight = 0
+max_in_flight = 0
+
+
+IDENTIFICATION = {"type": "integer-numbers", "description": "whole numbers"}
+CUSTOM_TYPE = {"name": "counts", "description": "", "rules": [], "examples": [], "notExamples": []}
+
+
+class SleepingLLM:
+    async def astream(self, prompt, **kwargs):
+        global in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            await asyncio.sleep(LLM_LATENCY)
+        finally:
+            in_flight -= 1
+        content = CUSTOM_TYPE if "suggest a custom type definition" in prompt else IDENTIFICATION
+        yield AIMessageChunk(content=json.dumps(content))
+
+
+def sleeping_llm(config):
+    return SleepingLLM()
+
+
+# new for every run, so nothing comes from an earlier run's cached results
+RUN = uuid.uuid4().hex[:8]
+
+
+def sample_values(i: int) -> list:
+    # free text, which the local classifier leaves to the LLM
+    return [f"sample {RUN} {i} value {j}" for j in range(3)]
+
+
+async def one_identify(user_id: str, i: int) -> None:
+    async with db.get_read_session_for_user(user_id) as session:
+        await identify.identify_column(
+            identify.IdentifyColumnArgs(column_name=f"notes_{i}", sample_values=sample_values(i)),
+            session=session,
+            user_id=user_id,
+        )
+
+
+async def one_custom_type(user_id: str, i: int) -> None:
+    async with db.get_read_session_for_user(user_id) as session:
+        await custom_type.suggest_custom_type(
+            custom_type.SuggestCustomTypeArgs(
+                columnName=f"notes_{i}", sampleValues=sample_values(i)
+            ),
+            session=session,
+            user_id=user_id,
+        )
+
+
+async def main(user_id: str) -> None:
+    # what identify and suggest_custom_type call, through hedge.invoke
+    telemetry.create_llm = sleeping_llm  # type: ignore[assignment]
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(one_identify(user_id, i) for i in range(REQUESTS // 2)),
+        *(one_custom_type(user_id, i) for i in range(REQUESTS // 2)),
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{REQUESTS} requests, pool size 1, {LLM_LATENCY}s LLM latency: "
+        f"{elapsed:.2f}s total, max {max_in_flight} LLM calls in flight"
+    )
+    await db.dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1]))
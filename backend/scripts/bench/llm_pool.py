@@ -0,0 +1,92 @@
+"""Per-call overhead of a new LLM client per request vs. the shared pooled
+clients, at 50 concurrent requests.
+
+Runs scripts.mock_llm in its own process with a fixed latency, so anything
+above that latency is client overhead. "client per call" builds a ChatOpenAI
+with its own HTTP client for every call, like create_llm used to.
+
+    uv run python -m scripts.bench.llm_pool
+"""
+
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+PORT = 8765
+SERVER_LATENCY = 0.05
+CONCURRENCY = 50
+ROUNDS = 10
+
+os.environ["MOCK_LLM_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ.setdefault("LLM_PROVIDER", "mock")
+
+from langchain_openai import ChatOpenAI  # noqa: E402
+from pydantic import SecretStr  # noqa: E402
+
+from backend.suggest import LLMConfig, close_llms, create_llm  # noqa: E402
+from scripts import mock_llm  # noqa: E402
+
+config = LLMConfig(provider="mock", model_name="gpt-4o-mini", mode="structured")
+
+
+async def mock_stats(client: httpx.AsyncClient) -> dict:
+    """Stats since the last call."""
+    stats = (await client.get(f"http://127.0.0.1:{PORT}/stats")).json()
+    await client.post(f"http://127.0.0.1:{PORT}/stats/reset")
+    return stats
+
+
+async def client_per_call() -> None:
+    async with httpx.AsyncClient() as http_client:
+        llm = ChatOpenAI(
+            model_name=config.model_name,
+            openai_api_base=os.environ["MOCK_LLM_URL"],
+            openai_api_key=SecretStr("mock"),
+            http_async_client=http_client,
+        )
+        await llm.ainvoke("hello")
+
+
+async def shared_client() -> None:
+    await create_llm(config).ainvoke("hello")
+
+
+async def run(name: str, call) -> None:
+    async with httpx.AsyncClient() as client:
+        await mock_stats(client)
+        latencies = []
+
+        async def one() -> None:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+        for _ in range(ROUNDS):
+            await asyncio.gather(*(one() for _ in range(CONCURRENCY)))
+        overhead = sorted((latency - SERVER_LATENCY) * 1e3 for latency in latencies)
+        print(
+            f"{name}: overhead per call p50 {statistics.median(overhead):.1f} ms, "
+            f"p95 {overhead[int(len(overhead) * 0.95)]:.1f} ms, "
+            f"{(await mock_stats(client))['connections']} connections for {len(latencies)} calls"
+        )
+
+
+async def main() -> None:
+    process = mock_llm.start_process(
+        PORT, MOCK_LLM_LATENCY=f"fixed:{SERVER_LATENCY}", MOCK_LLM_TOKENS_PER_SECOND="0"
+    )
+    try:
+        # warm up imports and the server
+        await shared_client()
+        await run("client per call", client_per_call)
+        await run("shared client", shared_client)
+    finally:
+        await close_llms()
+        process.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
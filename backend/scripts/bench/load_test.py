@@ -0,0 +1,132 @@
+"""Throughput and p50/p95/p99 latency of the suggest endpoints under load.
+
+Point a running backend at the mock LLM, so results measure the backend and
+not OpenAI:
+
+    uv run python -m scripts.mock_llm
+    LLM_PROVIDER=mock uv run fastapi run backend/main.py
+    uv run python -m scripts.bench.load_test <user_id> --requests 200 --concurrency 20
+
+The access token is signed with SUPABASE_JWT_SECRET for the given user. Column
+names are unique per request so the identify cache does not absorb the load.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, List
+
+import httpx
+import jwt
+
+WORDS = "alpha beta gamma delta epsilon zeta theta kappa lambda sigma omega".split()
+
+
+def access_token(user_id: str) -> str:
+    return jwt.encode(
+        {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 60 * 60},
+        os.environ["SUPABASE_JWT_SECRET"],
+        algorithm="HS256",
+    )
+
+
+def sample_values() -> List[str]:
+    return [f"{random.choice(WORDS)} {random.choice(WORDS)}" for _ in range(10)]
+
+
+def identify_column_body() -> dict:
+    return {"column_name": f"column {uuid.uuid4().hex[:8]}", "sample_values": sample_values()}
+
+
+def custom_type_body() -> dict:
+    return {"columnName": f"column {uuid.uuid4().hex[:8]}", "sampleValues": sample_values()}
+
+
+def suggest_widget_body() -> dict:
+    return {
+        "engine": "vega-lite",
+        "columns": [
+            {
+                "fieldName": f"field_{i}",
+                "identification": {"type": "text", "description": "Text"},
+                "sampleValues": sample_values(),
+            }
+            for i in range(5)
+        ],
+        "existingWidgets": [],
+        "dataSize": 1000,
+    }
+
+
+ENDPOINTS: Dict[str, Callable[[], dict]] = {
+    "/identify/column": identify_column_body,
+    "/suggest/custom-type": custom_type_body,
+    "/suggest-widget": suggest_widget_body,
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def load(
+    client: httpx.AsyncClient,
+    path: str,
+    make_body: Callable[[], dict],
+    requests: int,
+    concurrency: int,
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=make_body())
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1e3)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(
+        f"{path:<22} {requests / elapsed:7.1f} req/s  "
+        f"p50 {statistics.median(latencies):7.1f} ms  "
+        f"p95 {percentile(latencies, 0.95):7.1f} ms  "
+        f"p99 {percentile(latencies, 0.99):7.1f} ms  "
+        f"status {dict(statuses)}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("user_id")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--endpoint", action="append", choices=list(ENDPOINTS))
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        headers={"Authorization": f"Bearer {access_token(args.user_id)}"},
+        limits=httpx.Limits(max_connections=args.concurrency),
+        timeout=120,
+    ) as client:
+        for path in args.endpoint or ENDPOINTS:
+            await load(client, path, ENDPOINTS[path], args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
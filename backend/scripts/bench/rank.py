@@ -0,0 +1,83 @@
+"""Identify prompt size and candidate selection latency as the custom type
+catalog grows, with and without relevance ranking.
+
+    uv run python -m scripts.bench.rank
+"""
+
+import random
+import time
+import uuid
+from datetime import datetime
+
+from backend.suggest import rank
+from backend.suggest.catalog import CatalogType
+from backend.suggest.identify import generate_type_prompt
+
+WORDS = (
+    "protein gene sequence sample flux reaction metabolite country region year price "
+    "temperature pressure species strain plate well assay lab patient visit dose unit "
+    "code label score rank category status batch lot chain residue position"
+).split()
+
+
+def approximate_tokens(prompt: str) -> int:
+    # ~4 characters per token for English text
+    return len(prompt) // 4
+
+
+def make_custom_type(i: int) -> CatalogType:
+    words = random.sample(WORDS, 3)
+    return CatalogType(
+        id=str(uuid.uuid4()),
+        kind=random.choice(["decimal", "integer", "enum", "date", "time"]),
+        name=f"{'-'.join(words)}-{i}",
+        description=f"Values describing the {' '.join(words)} of an experiment",
+        rules=(f"Must be a valid {words[0]}", f"Usually refers to a {words[1]}"),
+        examples=tuple(f"{words[2][:3].upper()}{random.randint(0, 999)}" for _ in range(3)),
+        min_value=None,
+        max_value=None,
+        log_scale=False,
+        values_key=None,
+        updated_at=datetime.now(),
+    )
+
+
+def main() -> None:
+    random.seed(0)
+    column_name, sample_values = "pdb_id", ["6TT7", "1ABC", "2XYZ", "7K3G"]
+
+    for size in [10, 100, 1_000, 10_000]:
+        catalog = [make_custom_type(i) for i in range(size)]
+        rank.index = rank.CustomTypeIndex()
+
+        start = time.perf_counter()
+        candidates = rank.select_candidates(column_name, sample_values, catalog)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        candidates = rank.select_candidates(column_name, sample_values, catalog)
+        warm = time.perf_counter() - start
+
+        full_tokens = approximate_tokens(generate_type_prompt(catalog))
+        ranked_tokens = approximate_tokens(generate_type_prompt(candidates))
+        print(
+            f"{size:>6} types: prompt ~{full_tokens:>7} → ~{ranked_tokens:>4} tokens, "
+            f"ranking {cold * 1e3:7.1f} ms cold / {warm * 1e3:6.2f} ms warm"
+        )
+
+    # two users with their own private types on top of the same public ones,
+    # taking turns
+    public = [make_custom_type(i) for i in range(10_000)]
+    users = [public + [make_custom_type(i) for i in range(100)] for _ in range(2)]
+    rank.index = rank.CustomTypeIndex()
+    for catalog in users:
+        rank.select_candidates(column_name, sample_values, catalog)
+    start = time.perf_counter()
+    for _ in range(5):
+        for catalog in users:
+            rank.select_candidates(column_name, sample_values, catalog)
+    alternating = (time.perf_counter() - start) / 10
+    print(f"two users taking turns, 10,100 types each: {alternating * 1e3:6.2f} ms per ranking")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Latency of validating a million-row column, including parsing the request
+body, for each custom type kind.
+
+Enum membership uses REDIS_CONNECTION_STRING (key br-bench-validate-values).
+
+    uv run python -m scripts.bench.validate
+"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime
+
+from backend.redis_client import close_redis, get_redis
+from backend.suggest.catalog import CatalogType
+from backend.validate import ValidateColumnArgs, validate_values
+
+ROWS = 1_000_000
+ENUM_KEY = "br-bench-validate-values"
+ENUM_SIZE = 100_000
+
+
+def make_type(kind: str, **kwargs) -> CatalogType:
+    return CatalogType(
+        **{
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "name": f"bench-{kind}",
+            "description": "",
+            "rules": (),
+            "examples": (),
+            "min_value": None,
+            "max_value": None,
+            "log_scale": False,
+            "values_key": None,
+            "updated_at": datetime.now(),
+            **kwargs,
+        }
+    )
+
+
+def make_values(make_value, distinct: int) -> list:
+    pool = [make_value() for _ in range(distinct)]
+    # 1% invalid
+    pool += ["not a value"] * (distinct // 100 + 1)
+    return [random.choice(pool) for _ in range(ROWS)]
+
+
+async def main() -> None:
+    random.seed(0)
+    redis = get_redis()
+    await redis.delete(ENUM_KEY)
+    for offset in range(0, ENUM_SIZE, 10_000):
+        await redis.sadd(ENUM_KEY, *(f"V{i}" for i in range(offset, offset + 10_000)))
+
+    cases = [
+        (
+            make_type("decimal", min_value=0.0, max_value=1e6, log_scale=True),
+            lambda: f"{random.uniform(0, 1e6):.4f}",
+        ),
+        (
+            make_type("integer", min_value=-1e9, max_value=1e9),
+            lambda: str(random.randint(-(10**9), 10**9)),
+        ),
+        (
+            make_type("date"),
+            lambda: f"{random.randint(1900, 2100)}-{random.randint(1, 12):02}-{random.randint(1, 28):02}",
+        ),
+        (
+            make_type("time"),
+            lambda: f"{random.randint(0, 23):02}:{random.randint(0, 59):02}:{random.randint(0, 59):02}",
+        ),
+        (make_type("enum", values_key=ENUM_KEY), lambda: f"V{random.randrange(ENUM_SIZE)}"),
+    ]
+    for custom_type, make_value in cases:
+        for distinct in [1_000, ROWS]:
+            body = json.dumps(
+                {"type_id": custom_type.id, "values": make_values(make_value, distinct)}
+            )
+            start = time.perf_counter()
+            args = ValidateColumnArgs.model_validate_json(body)
+            parsed = time.perf_counter()
+            invalid = await validate_values(args.values, custom_type)
+            done = time.perf_counter()
+            print(
+                f"{custom_type.kind:>8}, {distinct:>7} distinct: parse {(parsed - start) * 1e3:6.1f} ms, "
+                f"validate {(done - parsed) * 1e3:6.1f} ms ({len(invalid)} invalid)"
+            )
+
+    await redis.delete(ENUM_KEY)
+    await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
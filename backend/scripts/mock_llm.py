@@ -0,0 +1,243 @@
+"""
+Local OpenAI-compatible LLM stub, for benchmarks and load tests
+
+Serves /v1/chat/completions (streaming or not) with canned JSON that fits the
+suggest prompts. Set LLM_PROVIDER=mock on the backend to use it:
+
+    uv run python -m scripts.mock_llm
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PORT = int(os.environ.get("MOCK_LLM_PORT", "8001"))
+# time to first token: fixed:<s>, uniform:<low>,<high> or lognormal:<median>,<sigma>
+LATENCY = os.environ.get("MOCK_LLM_LATENCY", "lognormal:0.8,0.5")
+# completion tokens per second after the first token; 0 for instant
+TOKENS_PER_SECOND = float(os.environ.get("MOCK_LLM_TOKENS_PER_SECOND", "100"))
+# share of requests answered with a 500 (or a 429 for one in four of those)
+FAILURE_RATE = float(os.environ.get("MOCK_LLM_FAILURE_RATE", "0"))
+# JSON file of {"prompt substring": response object}, checked before the
+# built-in responses. A string response is sent as is, e.g. malformed JSON.
+RESPONSES_FILE = os.environ.get("MOCK_LLM_RESPONSES")
+SEED = os.environ.get("MOCK_LLM_SEED")
+
+_random = random.Random(SEED)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: _random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: median * _random.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+sample_latency = parse_latency(LATENCY)
+
+
+def _first_field_name(prompt: str) -> str:
+    match = re.search(r'"fieldName": "([^"]+)"', prompt)
+    return match.group(1) if match else "x"
+
+
+def _builtin_response(prompt: str) -> dict:
+    if "suggest a custom type definition" in prompt:
+        return {
+            "name": "mock-type",
+            "description": "A type suggested by the mock LLM",
+            "rules": ["Must not be empty"],
+            "examples": ["a", "b"],
+            "notExamples": [""],
+        }
+    if "Vega-Lite" in prompt:
+        field = _first_field_name(prompt)
+        return {
+            "name": f"Count of {field}",
+            "description": "A bar chart suggested by the mock LLM",
+            "vegaLiteSpec": {
+                "mark": "bar",
+                "encoding": {
+                    "x": {"field": field, "type": "nominal"},
+                    "y": {"aggregate": "count", "type": "quantitative"},
+                },
+            },
+        }
+    if "Observable Plot" in prompt:
+        field = _first_field_name(prompt)
+        return {
+            "name": f"Count of {field}",
+            "description": "A bar chart suggested by the mock LLM",
+            "observablePlotCode": (
+                "document.getElementById('root').append("
+                f"Plot.barY(data, Plot.groupX({{y: 'count'}}, {{x: '{field}'}})).plot())"
+            ),
+        }
+    return {
+        "type": "text",
+        "description": "Identified by the mock LLM",
+        "suggestedActions": [],
+    }
+
+
+def load_responses(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+responses = load_responses(RESPONSES_FILE)
+
+
+def canned_response(prompt: str) -> str:
+    for marker, response in responses.items():
+        if marker in prompt:
+            return response if isinstance(response, str) else json.dumps(response)
+    return json.dumps(_builtin_response(prompt))
+
+
+def _approximate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+app = FastAPI()
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    failures: int = 0
+    clients: set = field(default_factory=set)
+
+
+stats = MockStats()
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats.requests += 1
+    if request.client:
+        stats.clients.add((request.client.host, request.client.port))
+
+    await asyncio.sleep(sample_latency())
+    if _random.random() < FAILURE_RATE:
+        stats.failures += 1
+        status = 429 if _random.random() < 0.25 else 500
+        return JSONResponse(
+            {"error": {"message": "Injected failure", "type": "mock_error", "code": status}},
+            status_code=status,
+        )
+
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    content = canned_response(prompt)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "mock")
+    usage = {
+        "prompt_tokens": _approximate_tokens(prompt),
+        "completion_tokens": _approximate_tokens(content),
+        "total_tokens": _approximate_tokens(prompt) + _approximate_tokens(content),
+    }
+
+    if not body.get("stream"):
+        if TOKENS_PER_SECOND > 0:
+            await asyncio.sleep(usage["completion_tokens"] / TOKENS_PER_SECOND)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    def chunk(choices: list, **extra) -> str:
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": choices,
+            **extra,
+        }
+        return f"data: {json.dumps(data)}\n\n"
+
+    def delta(content: dict, finish_reason: Optional[str] = None) -> list:
+        return [{"index": 0, "delta": content, "finish_reason": finish_reason}]
+
+    async def stream():
+        yield chunk(delta({"role": "assistant", "content": ""}))
+        # ~4 characters per token
+        for start in range(0, len(content), 4):
+            if TOKENS_PER_SECOND > 0:
+                await asyncio.sleep(1 / TOKENS_PER_SECOND)
+            yield chunk(delta({"content": content[start : start + 4]}))
+        yield chunk(delta({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield chunk([], usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def get_stats() -> dict:
+    return {
+        "requests": stats.requests,
+        "failures": stats.failures,
+        "connections": len(stats.clients),
+    }
+
+
+@app.post("/stats/reset")
+def reset_stats() -> None:
+    global stats
+    stats = MockStats()
+
+
+def start_process(port: int = PORT, **env: str) -> subprocess.Popen:
+    """Run the stub in a child process, e.g. for a benchmark, with MOCK_LLM_*
+    settings passed as keyword arguments. Returns once it accepts
+    connections."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "scripts.mock_llm"],
+        env={**os.environ, **env, "MOCK_LLM_PORT": str(port)},
+    )
+    for _ in range(200):
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return process
+        time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("Mock LLM did not start")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=PORT, log_level="warning")
@@ -55,6 +55,7 @@ export type SuggestCustomTypeArgs = {
     columnName: string;
     sampleValues: Array<string>;
     numericOptions?: NumericOptions | null;
+    columnValues?: Array<string> | null;
 };
 
 export type SuggestWidgetArgs = {
@@ -28,7 +28,10 @@ import {
   useIdentificationStoreHooks,
 } from "@/stores/identification-store";
 import { createClient, useUser } from "@/utils/supabase/client";
-import { getUniqueNonNullValues } from "@/utils/validation";
+import { getUniqueNonNullValues, sampleEvenly } from "@/utils/validation";
+
+// the most column values the backend profiles (NUMERIC_PROFILE_MAX_VALUES)
+const MAX_PROFILE_VALUES = 100_000;
 
 export interface CustomTypeContext {
   columnIndex: number;
@@ -109,6 +112,12 @@ export function CustomTypeForm({
                   kind,
                 }
               : undefined,
+          // min/max and log scale are computed from a large sample of the
+          // column
+          columnValues:
+            kind === "decimal" || kind === "integer"
+              ? sampleEvenly(context.allValues, MAX_PROFILE_VALUES)
+              : undefined,
         },
       });
       if (error) throw error;
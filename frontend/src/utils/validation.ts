@@ -77,3 +77,11 @@ export function getUniqueNonNullValues<T>(
 
   return Array.from(uniqueValues);
 }
+
+// Helper function to pick evenly spaced values, so sorted or grouped columns
+// are still covered
+export function sampleEvenly<T>(values: T[], size: number): T[] {
+  if (values.length <= size) return values;
+  const step = values.length / size;
+  return Array.from({ length: size }, (_, i) => values[Math.floor(i * step)]);
+}
@@ -0,0 +1,3 @@
+CREATE TRIGGER set_updated_at BEFORE UPDATE ON public.custom_type FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+
@@ -0,0 +1,5 @@
+CREATE INDEX custom_type_public_updated_at ON public.custom_type USING btree (updated_at) WHERE public;
+
+CREATE INDEX custom_type_user_id_updated_at ON public.custom_type USING btree (user_id, updated_at);
+
+
@@ -36,6 +36,19 @@ CREATE POLICY "Anyone can read public custom types" ON custom_type
     FOR SELECT
         USING (public = TRUE);
 
+-- updated_at versions the custom type catalog for the backend caches
+CREATE TRIGGER set_updated_at
+    BEFORE UPDATE ON custom_type
+    FOR EACH ROW
+    EXECUTE FUNCTION public.set_updated_at();
+
+-- keep the backend's catalog freshness probe (count and max(updated_at)) cheap
+CREATE INDEX custom_type_user_id_updated_at ON custom_type(user_id, updated_at);
+
+CREATE INDEX custom_type_public_updated_at ON custom_type(updated_at)
+WHERE
+    public;
+
 -- Create a table to track dirty custom types per table
 CREATE TABLE dirty_custom_type(
     id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,